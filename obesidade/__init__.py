@@ -0,0 +1 @@
+"""Componentes compartilhados entre o app Streamlit, o treino e as ferramentas de linha de comando."""
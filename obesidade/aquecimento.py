@@ -0,0 +1,102 @@
+"""Recursos do app criados sob demanda e aquecidos em segundo plano.
+
+Cada página do app importa só os módulos pesados que usa e pede só os
+recursos de que precisa (a base e o cubo no dashboard, o modelo no
+simulador), então a primeira página é desenhada sem esperar pelo resto.
+Depois do primeiro desenho, aquecer() prepara os demais recursos numa
+thread do processo, e a troca de página normalmente já os encontra prontos.
+
+Este módulo não importa pandas, NumPy nem matplotlib.
+"""
+import importlib
+import threading
+import time
+
+from obesidade.metricas import metricas
+
+
+class Recurso:
+    """Valor criado uma única vez por processo, na primeira chamada de obter().
+
+    Quem chama obter() enquanto outra thread (ex.: o aquecimento) ainda cria
+    o valor espera por ela em vez de repetir o trabalho. Falhas não ficam
+    guardadas: a próxima chamada tenta de novo.
+    """
+
+    def __init__(self, nome, fabrica):
+        self.nome = nome
+        self.fabrica = fabrica
+        self.segundos = None
+        self._valor = None
+        self._pronto = False
+        self._lock = threading.Lock()
+
+    @property
+    def pronto(self):
+        return self._pronto
+
+    def obter(self):
+        if self._pronto:
+            return self._valor
+        with self._lock:
+            if not self._pronto:
+                inicio = time.perf_counter()
+                self._valor = self.fabrica()
+                self.segundos = time.perf_counter() - inicio
+                metricas.observar('recurso', self.segundos, recurso=self.nome)
+                self._pronto = True
+        return self._valor
+
+
+_recursos = {}
+_lock = threading.Lock()
+_thread = None
+_partida = False
+
+
+def recurso(nome, fabrica):
+    # O Streamlit reexecuta o app.py a cada interação: o primeiro registro
+    # de cada nome vale para o processo inteiro
+    with _lock:
+        if nome not in _recursos:
+            _recursos[nome] = Recurso(nome, fabrica)
+        return _recursos[nome]
+
+
+def importar(*modulos):
+    # Tarefa de aquecimento que só importa módulos
+    def tarefa():
+        for modulo in modulos:
+            importlib.import_module(modulo)
+    return tarefa
+
+
+def aquecer(tarefas):
+    # tarefas: lista de (nome, função), executadas em ordem numa thread daemon.
+    # Só o primeiro pedido do processo inicia a thread; erros ficam para a
+    # página que usar o recurso mostrar
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return _thread
+
+        def executar():
+            for nome, tarefa in tarefas:
+                try:
+                    with metricas.span('aquecimento', etapa=nome):
+                        tarefa()
+                except Exception:
+                    pass
+
+        _thread = threading.Thread(target=executar, name='aquecimento', daemon=True)
+        _thread.start()
+        return _thread
+
+
+def marcar_partida():
+    # True só na primeira execução do app no processo (a partida a frio)
+    global _partida
+    with _lock:
+        primeira, _partida = not _partida, True
+        return primeira
+
@@ -0,0 +1,251 @@
+"""Artefato binário compacto da floresta, mapeado em memória.
+
+Alternativa ao .pkl (e ao .npz de obesidade.compilado) para servir o
+modelo: um único arquivo com cabeçalho JSON e arrays alinhados, que é
+aberto com mmap sem desserializar nada. Processos na mesma máquina que
+abrem o mesmo arquivo compartilham as páginas do cache do sistema.
+
+Layout dos nós (todas as árvores concatenadas, folhas apontando para si):
+  - feature: int16;
+  - limiar: float32, arredondado para baixo a partir do float64 do
+    scikit-learn. Como as features são comparadas em float32, x <= limiar
+    dá o mesmo resultado nos dois casos;
+  - filhos: int16 (ou int32 em árvores muito grandes), relativos à raiz
+    da árvore, na ordem [direita, esquerda];
+  - folha: int32, índice da distribuição da folha.
+As distribuições das folhas são guardadas quantizadas como contagens
+inteiras (uint16/uint32) de cada classe. Para florestas treinadas com
+bootstrap e sem class_weight, contagem / total reproduz exatamente o
+tree_.value do scikit-learn; nos demais casos as frações são quantizadas
+em 16 bits e só a classe prevista é garantida. A tabela de
+probabilidades em float64 só é materializada na primeira previsão.
+
+Exportação e verificação:
+    python -m obesidade.artefato models/modelo_obesidade.pkl models/modelo_obesidade.flor --verificar data/Obesity.csv
+"""
+import argparse
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+from obesidade.compilado import FlorestaCompilada, LINHAS_POR_BLOCO, parametros_preprocessamento
+
+MAGICA = b'OBFL'
+VERSAO = 1
+_ALINHAMENTO = 64
+_ESCALA_QUANTIZADA = 65535
+
+
+def _limiar_float32(limiar):
+    # Maior float32 <= limiar: para x float32, x <= limiar32 equivale a x <= limiar
+    limiar32 = limiar.astype(np.float32)
+    acima = limiar32.astype(np.float64) > limiar
+    limiar32[acima] = np.nextafter(limiar32[acima], np.float32(-np.inf))
+    return limiar32
+
+
+def _menor_inteiro(maximo, opcoes):
+    for tipo in opcoes:
+        if maximo <= np.iinfo(tipo).max:
+            return tipo
+    raise ValueError(f"Valor {maximo} não cabe em {opcoes[-1].__name__}")
+
+
+def _contagens_folhas(arvore, folha):
+    # Contagens inteiras que reproduzem exatamente tree_.value; None se não existirem
+    valores = arvore.value[folha, 0, :]
+    pesos = arvore.weighted_n_node_samples[folha]
+    contagens = np.round(valores * pesos[:, np.newaxis])
+    if (np.array_equal(contagens.sum(axis=1), pesos)
+            and np.array_equal(contagens / contagens.sum(axis=1, keepdims=True), valores)):
+        return contagens
+    return None
+
+
+def exportar(pipeline, caminho):
+    preprocessor = pipeline.named_steps['preprocessor']
+    floresta = pipeline.named_steps['model']
+    arvores = [e.tree_ for e in floresta.estimators_]
+
+    feature, limiar, direita, esquerda, folhas, raizes = [], [], [], [], [], []
+    contagens, valores = [], []
+    no_inicial = folha_inicial = 0
+    for arvore in arvores:
+        folha = arvore.children_left == -1
+        locais = np.arange(arvore.node_count)
+        esquerda.append(np.where(folha, locais, arvore.children_left))
+        direita.append(np.where(folha, locais, arvore.children_right))
+        feature.append(np.where(folha, 0, arvore.feature))
+        limiar.append(np.where(folha, np.inf, arvore.threshold))
+        indice_folha = np.full(arvore.node_count, -1, dtype=np.int64)
+        indice_folha[folha] = folha_inicial + np.arange(folha.sum())
+        folhas.append(indice_folha)
+        contagens.append(_contagens_folhas(arvore, folha))
+        valores.append(arvore.value[folha, 0, :])
+        raizes.append(no_inicial)
+        no_inicial += arvore.node_count
+        folha_inicial += int(folha.sum())
+
+    exato = all(c is not None for c in contagens)
+    if exato:
+        tabela = np.concatenate(contagens)
+        tipo_contagem = _menor_inteiro(tabela.max(), (np.uint16, np.uint32))
+    else:
+        tabela = np.round(np.concatenate(valores) * _ESCALA_QUANTIZADA)
+        tipo_contagem = np.uint16
+
+    maior_arvore = max(a.node_count for a in arvores)
+    arrays = {
+        'feature': np.concatenate(feature).astype(_menor_inteiro(floresta.n_features_in_, (np.int16, np.int32))),
+        'limiar': _limiar_float32(np.concatenate(limiar)),
+        'filhos': np.stack([np.concatenate(direita), np.concatenate(esquerda)], axis=1)
+                    .astype(_menor_inteiro(maior_arvore, (np.int16, np.int32))),
+        'folha': np.concatenate(folhas).astype(np.int32),
+        'contagens': tabela.astype(tipo_contagem),
+        'raizes': np.asarray(raizes, dtype=np.int32),
+    }
+    metadados = {
+        'classes': [str(c) for c in floresta.classes_],
+        'preprocessamento': parametros_preprocessamento(preprocessor),
+        'profundidade': int(max(a.max_depth for a in arvores)),
+        'exato': exato,
+    }
+    salvar(caminho, arrays, metadados)
+    return metadados
+
+
+def salvar(caminho, arrays, metadados):
+    # MAGICA | versão (u32) | tamanho do cabeçalho (u32) | cabeçalho JSON | arrays alinhados
+    indice, posicao = {}, 0
+    for nome, arr in arrays.items():
+        posicao = -(-posicao // _ALINHAMENTO) * _ALINHAMENTO
+        indice[nome] = {'dtype': arr.dtype.str, 'shape': list(arr.shape), 'offset': posicao}
+        posicao += arr.nbytes
+    cabecalho = json.dumps({'metadados': metadados, 'arrays': indice}).encode('utf-8')
+    inicio_dados = -(-(len(MAGICA) + 8 + len(cabecalho)) // _ALINHAMENTO) * _ALINHAMENTO
+
+    temporario = caminho + '.tmp'
+    with open(temporario, 'wb') as f:
+        f.write(MAGICA + struct.pack('<II', VERSAO, len(cabecalho)) + cabecalho)
+        for nome, arr in arrays.items():
+            f.seek(inicio_dados + indice[nome]['offset'])
+            f.write(np.ascontiguousarray(arr).tobytes())
+    # Troca atômica: processos que já mapearam o arquivo antigo continuam válidos
+    os.replace(temporario, caminho)
+
+
+class FlorestaCompacta(FlorestaCompilada):
+    """Mesma inferência da FlorestaCompilada, sobre os arrays mapeados do arquivo."""
+
+    def __init__(self, arrays, metadados):
+        self.feature = arrays['feature']
+        self.limiar = arrays['limiar']
+        self.filhos = arrays['filhos']
+        self.folha = arrays['folha']
+        self.contagens = arrays['contagens']
+        self.raizes = arrays['raizes']
+        self.metadados = metadados
+        self.classes_ = np.asarray(metadados['classes'], dtype=object)
+        self.profundidade = metadados['profundidade']
+        self.exato = metadados['exato']
+        self._probabilidades = None
+        self._preparar_transformacao()
+
+    @classmethod
+    def carregar(cls, caminho):
+        with open(caminho, 'rb') as f:
+            inicio = f.read(len(MAGICA) + 8)
+            if inicio[:len(MAGICA)] != MAGICA:
+                raise ValueError(f"'{caminho}' não é um artefato de floresta compacta.")
+            versao, tamanho = struct.unpack('<II', inicio[len(MAGICA):])
+            if versao != VERSAO:
+                raise ValueError(f"Versão {versao} do artefato não suportada (esperada {VERSAO}).")
+            cabecalho = json.loads(f.read(tamanho).decode('utf-8'))
+        inicio_dados = -(-(len(MAGICA) + 8 + tamanho) // _ALINHAMENTO) * _ALINHAMENTO
+
+        memoria = np.memmap(caminho, dtype=np.uint8, mode='r')
+        arrays = {}
+        for nome, info in cabecalho['arrays'].items():
+            tipo = np.dtype(info['dtype'])
+            forma = tuple(info['shape'])
+            inicio = inicio_dados + info['offset']
+            tamanho_bytes = tipo.itemsize * int(np.prod(forma))
+            arrays[nome] = memoria[inicio:inicio + tamanho_bytes].view(tipo).reshape(forma)
+        return cls(arrays, cabecalho['metadados'])
+
+    @property
+    def probabilidades_folhas(self):
+        # Materializada na primeira previsão (só as folhas, em float64)
+        if self._probabilidades is None:
+            contagens = np.asarray(self.contagens, dtype=np.float64)
+            if self.exato:
+                self._probabilidades = contagens / contagens.sum(axis=1, keepdims=True)
+            else:
+                self._probabilidades = contagens / _ESCALA_QUANTIZADA
+        return self._probabilidades
+
+    def _percorrer(self, X32):
+        n = X32.shape[0]
+        linhas = np.arange(n)[:, np.newaxis]
+        raizes = self.raizes.astype(np.int64)
+        no = np.broadcast_to(raizes, (n, len(raizes))).copy()
+        for _ in range(self.profundidade):
+            vai_esquerda = X32[linhas, self.feature[no]] <= self.limiar[no]
+            no = raizes + self.filhos[no, vai_esquerda.view(np.int8)]
+        # Soma acumulada árvore a árvore (mesma ordem de soma do scikit-learn)
+        return self.probabilidades_folhas[self.folha[no]].cumsum(axis=1)[:, -1, :] / len(raizes)
+
+    def salvar(self, caminho):
+        salvar(caminho, {nome: np.asarray(getattr(self, nome)) for nome in
+                         ('feature', 'limiar', 'filhos', 'folha', 'contagens', 'raizes')}, self.metadados)
+
+
+def verificar(pipeline, compacta, dados):
+    # Compara com o pipeline original: classes sempre, probabilidades quando exato
+    X = dados[compacta.colunas]
+    esperado = pipeline.predict_proba(X)
+    obtido = np.concatenate([compacta.predict_proba(X.iloc[i:i + LINHAS_POR_BLOCO])
+                             for i in range(0, len(X), LINHAS_POR_BLOCO)])
+    classes_iguais = np.array_equal(np.argmax(esperado, axis=1), np.argmax(obtido, axis=1))
+    return {
+        'linhas': len(X),
+        'classes_identicas': classes_iguais,
+        'probabilidades_identicas': np.array_equal(esperado, obtido),
+        'maior_diferenca': float(np.abs(esperado - obtido).max()) if len(X) else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta o pipeline .pkl para o artefato binário compacto.")
+    parser.add_argument('modelo', help="Pipeline .pkl de origem")
+    parser.add_argument('saida', help="Arquivo de destino (ex.: models/modelo_obesidade.flor)")
+    parser.add_argument('--verificar', default='data/Obesity.csv',
+                        help="CSV de referência para conferir as previsões (vazio para pular)")
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+    from obesidade.registro import registro_modelos
+
+    pipeline = registro_modelos.obter(args.modelo).modelo
+    metadados = exportar(pipeline, args.saida)
+    tamanho_pkl, tamanho = os.path.getsize(args.modelo), os.path.getsize(args.saida)
+    print(f"Artefato compacto: {tamanho / 1e6:.2f} MB (pickle: {tamanho_pkl / 1e6:.2f} MB) -> '{args.saida}'"
+          f"{'' if metadados['exato'] else ' [folhas quantizadas em 16 bits]'}")
+
+    if args.verificar:
+        inicio = time.perf_counter()
+        compacta = FlorestaCompacta.carregar(args.saida)
+        print(f"Carga: {(time.perf_counter() - inicio) * 1000:.2f}ms")
+        resultado = verificar(pipeline, compacta, pd.read_csv(args.verificar))
+        print(f"{resultado['linhas']:,} linhas | classes idênticas: {'SIM' if resultado['classes_identicas'] else 'NÃO'}"
+              f" | probabilidades idênticas: {'SIM' if resultado['probabilidades_identicas'] else 'NÃO'}"
+              f" (maior diferença {resultado['maior_diferenca']:.2e})")
+        if not resultado['classes_identicas'] or (metadados['exato'] and not resultado['probabilidades_identicas']):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
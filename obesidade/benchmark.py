@@ -0,0 +1,295 @@
+"""Suíte de benchmarks dos caminhos críticos do app.
+
+Uso:
+    python -m obesidade.benchmark --linhas 200000 --salvar-baseline      # grava benchmarks/baseline.json
+    python -m obesidade.benchmark --linhas 200000                        # compara com o baseline
+
+Mede, sobre dados sintéticos no esquema do Obesity.csv (amostrados da base
+real e levemente perturbados):
+  - carga a frio da base (CSV e Arrow) e do modelo (este num interpretador
+    novo, incluindo a importação do joblib e do scikit-learn);
+  - vazão de arredondar_valores e do ColumnTransformer;
+  - latência (p50/p95/p99) de predict e predict_proba por tamanho de lote;
+  - montagem do cubo e filtro + agregação do dashboard sobre ele;
+  - partida a frio do app: primeira execução de cada página num
+    interpretador novo (via streamlit.testing, sem servidor).
+
+Os resultados saem em JSON. Com um baseline salvo, qualquer métrica que
+piore além da tolerância faz o comando terminar com código 1 (útil para
+validar atualizações de scikit-learn, pandas ou numpy). Nas latências, só
+a p50 entra nessa comparação; p95 e p99 são informativas, a não ser que
+tenham pelo menos MIN_REPETICOES_CAUDA medições (com poucas repetições
+elas são só o máximo, e a comparação ficaria instável).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from obesidade.cubo import CuboAgregado, colunas_dashboard
+from obesidade.dados import carregar_base, converter_csv, derivar_colunas
+from obesidade.nucleo import arredondar_valores, cols_modelo, cols_numericas
+from obesidade.registro import RegistroModelos
+
+BASELINE_PADRAO = 'benchmarks/baseline.json'
+LOTES_PADRAO = [1, 10, 100, 1000, 10_000, 100_000]
+PAGINAS_APP = ['dashboard', 'insights', 'simulador']
+
+# Medições necessárias para p95/p99 entrarem na comparação com o baseline
+MIN_REPETICOES_CAUDA = 50
+
+# Roda em um processo novo: mede só a primeira execução do app.py (importações,
+# carga dos recursos da página e desenho), sem a subida do interpretador
+_SCRIPT_PARTIDA = '''
+import sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=300)
+app.query_params['pagina'] = sys.argv[2]
+inicio = time.perf_counter()
+app.run()
+print(time.perf_counter() - inicio)
+'''
+
+# Também em um processo novo: o registro, o joblib e o scikit-learn ainda não
+# foram importados, como na primeira carga do modelo num servidor recém-iniciado
+_SCRIPT_CARGA_MODELO = '''
+import sys, time
+inicio = time.perf_counter()
+from obesidade.registro import RegistroModelos
+RegistroModelos().obter(sys.argv[1])
+print(time.perf_counter() - inicio)
+'''
+
+
+def gerar_dados(caminho_base, linhas, semente=42):
+    base = pd.read_csv(caminho_base)
+    rng = np.random.default_rng(semente)
+    amostra = base.sample(n=linhas, replace=True, random_state=semente).reset_index(drop=True)
+    # Ruído pequeno nas numéricas para não repetir exatamente as mesmas linhas
+    for col in cols_numericas:
+        desvio = base[col].std() * 0.02
+        minimo, maximo = base[col].min(), base[col].max()
+        amostra[col] = np.clip(amostra[col] + rng.normal(0, desvio, linhas), minimo, maximo)
+    return amostra
+
+
+def _cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return np.asarray(tempos)
+
+
+def _em_processo_novo(script, pasta, *args):
+    # Segundos impressos pelo script na última linha
+    ambiente = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [pasta, os.environ.get('PYTHONPATH')]))}
+    saida = subprocess.run([sys.executable, '-c', script, *args],
+                           cwd=pasta, env=ambiente, capture_output=True, text=True, check=True)
+    return float(saida.stdout.strip().splitlines()[-1])
+
+
+def _partida(app, pagina):
+    app = os.path.abspath(app)
+    return _em_processo_novo(_SCRIPT_PARTIDA, os.path.dirname(app), app, pagina)
+
+
+def _carga_modelo(caminho_modelo):
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return _em_processo_novo(_SCRIPT_CARGA_MODELO, raiz, os.path.abspath(caminho_modelo))
+
+
+def _repeticoes(tamanho, orcamento=20_000, minimo=10, maximo=200):
+    # Mais repetições para lotes pequenos, sem estourar o tempo total
+    return int(min(maximo, max(minimo, orcamento // max(tamanho, 1))))
+
+
+class Resultados:
+    def __init__(self):
+        self.metricas = {}
+
+    def tempo(self, nome, tempos):
+        # Latências em ms; "menor é melhor". Métricas informativas saem no
+        # resultado, mas não na comparação com o baseline
+        for rotulo, q in (('p50', 50), ('p95', 95), ('p99', 99)):
+            self.metricas[f'{nome}.{rotulo}_ms'] = {
+                'valor': float(np.percentile(tempos, q) * 1000), 'melhor': 'menor',
+                'repeticoes': len(tempos),
+                'informativa': q != 50 and len(tempos) < MIN_REPETICOES_CAUDA}
+
+    def vazao(self, nome, linhas, tempos):
+        self.metricas[f'{nome}.linhas_por_s'] = {
+            'valor': float(linhas / np.median(tempos)), 'melhor': 'maior'}
+
+    def valor(self, nome, valor, melhor='menor'):
+        self.metricas[nome] = {'valor': float(valor), 'melhor': melhor}
+
+
+def executar(caminho_base='data/Obesity.csv', caminho_modelo='models/modelo_obesidade.pkl',
+             linhas=100_000, lotes=None, repeticoes_carga=5, progresso=print, app='app.py'):
+    lotes = [b for b in (lotes or LOTES_PADRAO) if b <= linhas]
+    res = Resultados()
+    dados = gerar_dados(caminho_base, linhas)
+    X = dados[cols_modelo]
+
+    with tempfile.TemporaryDirectory(prefix='obesidade-bench-') as pasta:
+        # --- CARGA A FRIO ---
+        csv = os.path.join(pasta, 'Obesity.csv')
+        arrow = os.path.join(pasta, 'Obesity.arrow')
+        dados.to_csv(csv, index=False)
+        progresso(f"carregar_dados ({linhas:,} linhas)")
+        res.tempo('carregar_dados.csv', _cronometrar(
+            lambda: carregar_base(csv, colunas_dashboard, caminho_colunar=os.path.join(pasta, 'inexistente.arrow')),
+            repeticoes_carga))
+        converter_csv(csv, arrow)
+        res.tempo('carregar_dados.arrow', _cronometrar(
+            lambda: carregar_base(csv, colunas_dashboard, caminho_colunar=arrow), repeticoes_carga))
+
+    progresso("carregar_modelo")
+    res.tempo('carregar_modelo', np.asarray([_carga_modelo(caminho_modelo) for _ in range(repeticoes_carga)]))
+    pipeline = RegistroModelos().obter(caminho_modelo).modelo
+    preprocessor = pipeline.named_steps['preprocessor']
+
+    # --- PRÉ-PROCESSAMENTO ---
+    progresso("arredondar_valores / ColumnTransformer")
+    res.vazao('arredondar_valores', linhas, _cronometrar(lambda: arredondar_valores(X), 5))
+    res.vazao('column_transformer', linhas, _cronometrar(lambda: preprocessor.transform(X), 5))
+
+    # --- INFERÊNCIA ---
+    for lote in lotes:
+        progresso(f"predict/predict_proba lote={lote:,}")
+        amostra = X.iloc[:lote]
+        n = _repeticoes(lote)
+        res.tempo(f'predict.lote_{lote}', _cronometrar(lambda: pipeline.predict(amostra), n))
+        res.tempo(f'predict_proba.lote_{lote}', _cronometrar(lambda: pipeline.predict_proba(amostra), n))
+
+    # --- DASHBOARD ---
+    progresso("dashboard: cubo + filtro/agregação")
+    base_dash = derivar_colunas(dados.copy())
+    res.tempo('dashboard.montar_cubo', _cronometrar(lambda: CuboAgregado.de_dataframe(base_dash), repeticoes_carga))
+    cubo = CuboAgregado.de_dataframe(base_dash)
+
+    rng = np.random.default_rng(0)
+
+    def filtrar_e_agregar():
+        filtros = {}
+        for dim in ('Gender', 'family_history', 'Faixa_Etaria', 'MTRANS'):
+            valores = cubo.valores(dim)
+            k = rng.integers(1, len(valores) + 1)
+            filtros[dim] = list(rng.choice(np.asarray(valores, dtype=object), size=k, replace=False))
+        f = cubo.filtrar(filtros)
+        f.total()
+        f.contagem('Obesity_PT')
+        f.contagem('family_history')
+        f.tabela('MTRANS', 'Obesity_PT')
+        f.tabela('Obesity_PT', 'CAEC')
+        f.tabela('Obesity_PT', 'SMOKE', normalizar=True)
+        f.media('CH2O', 'Obesity_PT')
+        f.media('NCP', 'Obesity_PT')
+        f.histograma('TUE', 'Obesity_PT')
+        f.histograma('Age', 'Obesity_PT')
+
+    res.tempo('dashboard.filtro_agregacao', _cronometrar(filtrar_e_agregar, 30))
+
+    # --- PARTIDA A FRIO DO APP ---
+    if app and os.path.exists(app):
+        for pagina in PAGINAS_APP:
+            progresso(f"partida a frio: {pagina}")
+            res.tempo(f'partida.{pagina}', np.asarray([_partida(app, pagina) for _ in range(repeticoes_carga)]))
+
+    import sklearn
+    return {
+        'metadados': {
+            'linhas': linhas,
+            'lotes': lotes,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__,
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+            'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'metricas': res.metricas,
+    }
+
+
+def comparar(atual, baseline, tolerancia=0.25):
+    # Devolve a lista de regressões: métricas que pioraram mais que a tolerância
+    # e métricas do baseline que sumiram da execução atual (valor None), como
+    # um benchmark quebrado ou a partida a frio sem --app
+    regressoes = []
+    for nome, base in baseline['metricas'].items():
+        if nome not in atual['metricas']:
+            regressoes.append((nome, base['valor'], None, None))
+            continue
+        if base.get('informativa') or atual['metricas'][nome].get('informativa'):
+            continue
+        valor, referencia = atual['metricas'][nome]['valor'], base['valor']
+        if referencia <= 0:
+            continue
+        if base['melhor'] == 'menor':
+            variacao = valor / referencia - 1
+        else:
+            variacao = referencia / valor - 1 if valor > 0 else float('inf')
+        if variacao > tolerancia:
+            regressoes.append((nome, referencia, valor, variacao))
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de carga, pré-processamento, inferência e dashboard.")
+    parser.add_argument('--dados', default='data/Obesity.csv', help="Base usada para gerar os dados sintéticos")
+    parser.add_argument('--modelo', default='models/modelo_obesidade.pkl')
+    parser.add_argument('--linhas', type=int, default=100_000, help="Linhas dos dados sintéticos")
+    parser.add_argument('--lotes', type=int, nargs='+', default=LOTES_PADRAO, help="Tamanhos de lote da inferência")
+    parser.add_argument('--app', default='app.py', help="App medido na partida a frio (vazio para pular)")
+    parser.add_argument('--saida', default='benchmarks/resultado.json', help="JSON com os resultados")
+    parser.add_argument('--baseline', default=BASELINE_PADRAO)
+    parser.add_argument('--salvar-baseline', action='store_true', help="Grava o resultado como novo baseline")
+    parser.add_argument('--tolerancia', type=float, default=0.25,
+                        help="Piora relativa aceita antes de acusar regressão (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    resultado = executar(args.dados, args.modelo, args.linhas, args.lotes,
+                         progresso=lambda m: print(f"- {m}", file=sys.stderr), app=args.app)
+
+    destinos = [args.saida] + ([args.baseline] if args.salvar_baseline else [])
+    for destino in destinos:
+        os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+        with open(destino, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2)
+
+    for nome, m in sorted(resultado['metricas'].items()):
+        print(f"{nome:<45} {m['valor']:>14,.3f}")
+
+    if args.salvar_baseline:
+        print(f"\nBaseline salvo em '{args.baseline}'.")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"\nSem baseline em '{args.baseline}' (use --salvar-baseline).")
+        return
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressoes = comparar(resultado, baseline, args.tolerancia)
+    if regressoes:
+        print(f"\nREGRESSÕES (tolerância {args.tolerancia:.0%}):")
+        for nome, referencia, valor, variacao in regressoes:
+            if valor is None:
+                print(f"  {nome}: ausente nesta execução (baseline {referencia:,.3f})")
+            else:
+                print(f"  {nome}: {referencia:,.3f} -> {valor:,.3f} ({variacao:+.0%} pior)")
+        raise SystemExit(1)
+    print(f"\nNenhuma regressão acima de {args.tolerancia:.0%} em relação ao baseline.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Cache LRU das figuras já renderizadas do dashboard.
+
+As imagens (PNG/SVG em bytes) são guardadas por uma chave derivada do
+gráfico, da seleção de filtros e da versão dos dados. Ao ultrapassar o
+orçamento de memória, as entradas usadas há mais tempo são descartadas.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from obesidade.metricas import metricas
+
+
+class CacheFiguras:
+    def __init__(self, orcamento_bytes=64 * 1024 * 1024):
+        self.orcamento_bytes = orcamento_bytes
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_usados = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+
+    @staticmethod
+    def chave(*partes):
+        # Listas de filtros são ordenadas para que a ordem de seleção não importe
+        def normalizar(valor):
+            if isinstance(valor, dict):
+                return {str(k): normalizar(v) for k, v in valor.items()}
+            if isinstance(valor, (list, tuple, set)):
+                return sorted(str(v) for v in valor)
+            return str(valor)
+        texto = json.dumps([normalizar(p) for p in partes], sort_keys=True)
+        return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+    def obter(self, chave):
+        with self._lock:
+            dados = self._itens.get(chave)
+            if dados is None:
+                self.falhas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return dados
+
+    def contem(self, chave):
+        # Consulta sem contar acerto/falha nem mudar a ordem do LRU
+        with self._lock:
+            return chave in self._itens
+
+    def guardar(self, chave, dados):
+        tamanho = len(dados)
+        if tamanho > self.orcamento_bytes:
+            return
+        with self._lock:
+            antigo = self._itens.pop(chave, None)
+            if antigo is not None:
+                self.bytes_usados -= len(antigo)
+            self._itens[chave] = dados
+            self.bytes_usados += tamanho
+            while self.bytes_usados > self.orcamento_bytes:
+                _, removido = self._itens.popitem(last=False)
+                self.bytes_usados -= len(removido)
+                self.descartes += 1
+
+    def obter_ou_renderizar(self, chave, gerar):
+        # gerar() devolve os bytes da imagem (b'' quando o gráfico não se aplica)
+        dados = self.obter(chave)
+        if dados is None:
+            dados = gerar()
+            self.guardar(chave, dados)
+        return dados
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'itens': len(self._itens),
+                'bytes_usados': self.bytes_usados,
+                'orcamento_bytes': self.orcamento_bytes,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'descartes': self.descartes,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            }
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self.bytes_usados = 0
+
+
+# Instância única do processo, compartilhada entre as sessões do Streamlit
+cache_figuras = CacheFiguras()
+metricas.registrar_fonte('cache_figuras', cache_figuras.estatisticas)
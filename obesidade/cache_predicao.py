@@ -0,0 +1,127 @@
+"""Cache de previsões do Simulador de Risco.
+
+O pipeline arredonda FCVC, NCP, CH2O, FAF e TUE para inteiros antes de
+escalar, e as categóricas vêm dos pequenos mapa_*; por isso muitos envios
+diferentes do formulário chegam à floresta como a mesma entrada. A chave
+do cache é essa entrada já arredondada e traduzida, com Idade, Altura e
+Peso quantizados numa resolução configurável. Em caso de acerto a
+floresta não é consultada.
+
+Na falha, a previsão é feita sobre o perfil quantizado (e não sobre os
+valores exatos do envio), para que o resultado guardado valha igualmente
+para todos os envios que compartilham a chave.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from obesidade.metricas import metricas
+from obesidade.nucleo import cols_arredondadas, cols_modelo, mapas_por_coluna
+
+# Resolução padrão: o passo dos campos do formulário (Idade é inteiro; nos
+# number_input de float o Streamlit usa passo 0,01), para que o cache nunca
+# junte dois valores que o formulário distingue
+resolucao_padrao = {'Age': 1.0, 'Height': 0.01, 'Weight': 0.01}
+
+
+def _quantizar(valor, passo):
+    # Inteiro de passos evita chaves diferentes por ruído de ponto flutuante
+    return int(np.round(float(valor) / passo))
+
+
+def _copia(resultado):
+    # O chamador recebe a sua cópia: alterá-la não muda o que está no cache
+    return {'classe': resultado['classe'], 'probabilidades': dict(resultado['probabilidades'])}
+
+
+class CachePredicoes:
+    def __init__(self, capacidade=4096, resolucao=None):
+        self.capacidade = capacidade
+        self.resolucao = dict(resolucao_padrao if resolucao is None else resolucao)
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+
+    def chave(self, registro):
+        partes = []
+        for col in cols_modelo:
+            valor = registro[col]
+            if col in mapas_por_coluna:
+                valor = mapas_por_coluna[col].get(valor, valor)
+            elif col in cols_arredondadas:
+                valor = int(np.round(float(valor)))
+            elif col in self.resolucao:
+                valor = _quantizar(valor, self.resolucao[col])
+            partes.append(valor)
+        return tuple(partes)
+
+    def _perfil(self, chave):
+        # Reconstrói a entrada representada pela chave (uma linha para o pipeline)
+        perfil = {}
+        for col, valor in zip(cols_modelo, chave):
+            if col in self.resolucao and col not in cols_arredondadas:
+                valor = round(valor * self.resolucao[col], 10)
+            perfil[col] = [valor]
+        return pd.DataFrame(perfil, columns=cols_modelo)
+
+    def prever(self, modelo, registro, versao=None):
+        # versao identifica o modelo (ex.: sha256 do .pkl); um modelo novo não
+        # reaproveita previsões do anterior
+        chave = (versao, self.chave(registro))
+        with self._lock:
+            resultado = self._itens.get(chave)
+            if resultado is not None:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return _copia(resultado)
+            self.falhas += 1
+
+        proba = self._predict_proba(modelo, self._perfil(chave[1]))[0]
+        classes = [str(c) for c in modelo.classes_]
+        resultado = {
+            'classe': classes[int(np.argmax(proba))],
+            'probabilidades': dict(zip(classes, proba.tolist())),
+        }
+        with self._lock:
+            self._itens[chave] = resultado
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+                self.descartes += 1
+        return _copia(resultado)
+
+    @staticmethod
+    def _predict_proba(modelo, X):
+        # Em um Pipeline, mede separadamente o pré-processamento e a floresta
+        if not hasattr(modelo, 'named_steps'):
+            with metricas.span('simulador.predict'):
+                return modelo.predict_proba(X)
+        with metricas.span('simulador.transform'):
+            Xt = modelo[:-1].transform(X)
+        with metricas.span('simulador.predict'):
+            return modelo[-1].predict_proba(Xt)
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'itens': len(self._itens),
+                'capacidade': self.capacidade,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'descartes': self.descartes,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            }
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+
+# Instância única do processo, compartilhada entre as sessões do Streamlit
+cache_predicoes = CachePredicoes()
+metricas.registrar_fonte('cache_predicoes', cache_predicoes.estatisticas)
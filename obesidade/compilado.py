@@ -0,0 +1,286 @@
+"""Floresta compilada em arrays NumPy contíguos.
+
+O pipeline treinado (ColumnTransformer + RandomForestClassifier) é
+exportado para um único .npz com:
+  - os parâmetros do pré-processamento (arredondamento, StandardScaler,
+    categorias do OrdinalEncoder e do OneHotEncoder);
+  - os nós de todas as árvores concatenados (feature, threshold, filhos
+    esquerdo/direito e distribuição de classes das folhas).
+
+A inferência percorre todas as árvores de todas as linhas ao mesmo tempo,
+um nível por iteração, e reproduz exatamente as operações de ponto
+flutuante do scikit-learn (features em float32, probabilidades somadas
+árvore a árvore em float64), então as saídas são idênticas às do pipeline.
+Carregar e servir não importa o scikit-learn.
+
+Exportação:
+    python -m obesidade.compilado models/modelo_obesidade.pkl models/modelo_obesidade.npz
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from obesidade.nucleo import cols_arredondadas, mapas_por_coluna
+
+# Maior bloco de linhas processado de uma vez (limita o array linhas x árvores x classes)
+LINHAS_POR_BLOCO = 4096
+
+
+def parametros_preprocessamento(preprocessor):
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, OrdinalEncoder, StandardScaler
+
+    blocos = []
+    for nome, transformador, colunas in preprocessor.transformers_:
+        if nome == 'remainder':
+            if transformador != 'drop':
+                raise ValueError("Só é possível compilar ColumnTransformer com remainder='drop'.")
+            continue
+        colunas = list(colunas)
+        passos = transformador.steps if isinstance(transformador, Pipeline) else [(nome, transformador)]
+        bloco = {'colunas': colunas}
+        for _, passo in passos:
+            if isinstance(passo, FunctionTransformer):
+                if getattr(passo.func, '__name__', '') != 'arredondar_valores':
+                    raise ValueError(f"FunctionTransformer não suportado: {passo.func!r}")
+                bloco['arredondar'] = [c in cols_arredondadas for c in colunas]
+            elif isinstance(passo, StandardScaler):
+                bloco['tipo'] = 'numerico'
+                n = len(colunas)
+                bloco['media'] = (passo.mean_ if passo.with_mean else np.zeros(n)).tolist()
+                bloco['escala'] = (passo.scale_ if passo.with_std else np.ones(n)).tolist()
+            elif isinstance(passo, OrdinalEncoder):
+                if passo.handle_unknown == 'use_encoded_value':
+                    desconhecido = float(passo.unknown_value)
+                else:
+                    desconhecido = None
+                bloco['tipo'] = 'ordinal'
+                bloco['categorias'] = [[str(v) for v in cats] for cats in passo.categories_]
+                bloco['desconhecido'] = desconhecido
+            elif isinstance(passo, OneHotEncoder):
+                if passo.drop is not None:
+                    raise ValueError("OneHotEncoder com 'drop' não é suportado.")
+                bloco['tipo'] = 'onehot'
+                bloco['categorias'] = [[str(v) for v in cats] for cats in passo.categories_]
+                bloco['ignorar_desconhecido'] = passo.handle_unknown != 'error'
+            else:
+                raise ValueError(f"Transformador não suportado: {type(passo).__name__}")
+        if 'tipo' not in bloco:
+            raise ValueError(f"Bloco '{nome}' sem StandardScaler/OrdinalEncoder/OneHotEncoder.")
+        blocos.append(bloco)
+    return blocos
+
+
+def compilar_pipeline(pipeline):
+    preprocessor = pipeline.named_steps['preprocessor']
+    floresta = pipeline.named_steps['model']
+
+    feature, limiar, esquerda, direita, valores, raizes = [], [], [], [], [], []
+    profundidade = 0
+    deslocamento = 0
+    for estimador in floresta.estimators_:
+        arvore = estimador.tree_
+        folha = arvore.children_left == -1
+        indices = np.arange(arvore.node_count)
+        # Folhas apontam para si mesmas: o percurso pode seguir por um número
+        # fixo de níveis sem testar se cada linha já chegou ao fim
+        esquerda.append(np.where(folha, indices, arvore.children_left) + deslocamento)
+        direita.append(np.where(folha, indices, arvore.children_right) + deslocamento)
+        feature.append(np.where(folha, 0, arvore.feature))
+        limiar.append(np.where(folha, np.inf, arvore.threshold))
+        # A partir do scikit-learn 1.4 tree_.value já guarda a fração de cada
+        # classe na folha, que é exatamente o que predict_proba da árvore devolve
+        valores.append(arvore.value[:, 0, :])
+        raizes.append(deslocamento)
+        profundidade = max(profundidade, arvore.max_depth)
+        deslocamento += arvore.node_count
+
+    metadados = {
+        'classes': [str(c) for c in floresta.classes_],
+        'preprocessamento': parametros_preprocessamento(preprocessor),
+        'profundidade': int(profundidade),
+    }
+    return FlorestaCompilada(
+        feature=np.concatenate(feature).astype(np.int32),
+        limiar=np.concatenate(limiar).astype(np.float64),
+        esquerda=np.concatenate(esquerda).astype(np.int32),
+        direita=np.concatenate(direita).astype(np.int32),
+        valores=np.concatenate(valores).astype(np.float64),
+        raizes=np.asarray(raizes, dtype=np.int32),
+        metadados=metadados,
+    )
+
+
+def _tabela(coluna, categorias, tipo):
+    # Código de cada categoria, incluindo os rótulos em português do
+    # formulário (mapa_*), para dispensar a tradução linha a linha
+    tabela = {v: tipo(i) for i, v in enumerate(categorias)}
+    for rotulo, valor in mapas_por_coluna.get(coluna, {}).items():
+        if valor in tabela and rotulo not in tabela:
+            tabela[rotulo] = tabela[valor]
+    return tabela
+
+
+class FlorestaCompilada:
+    def __init__(self, feature, limiar, esquerda, direita, valores, raizes, metadados):
+        self.feature = feature
+        self.limiar = limiar
+        self.esquerda = esquerda
+        self.direita = direita
+        self.valores = valores
+        self.raizes = raizes
+        self.metadados = metadados
+        self.classes_ = np.asarray(metadados['classes'], dtype=object)
+        self.profundidade = metadados['profundidade']
+        # Coluna 0 = filho direito, coluna 1 = filho esquerdo (indexada pelo resultado da comparação)
+        self._filhos = np.stack([direita, esquerda], axis=1)
+        self._preparar_transformacao()
+
+    def _preparar_transformacao(self):
+        self.colunas = []
+        self._etapas = []
+        for bloco in self.metadados['preprocessamento']:
+            self.colunas.extend(bloco['colunas'])
+            if bloco['tipo'] == 'numerico':
+                self._etapas.append(('numerico', bloco['colunas'], (
+                    np.asarray(bloco.get('arredondar', [False] * len(bloco['colunas']))),
+                    np.asarray(bloco['media'], dtype=np.float64),
+                    np.asarray(bloco['escala'], dtype=np.float64),
+                )))
+            elif bloco['tipo'] == 'ordinal':
+                tabelas = [_tabela(c, cats, float) for c, cats in zip(bloco['colunas'], bloco['categorias'])]
+                self._etapas.append(('ordinal', bloco['colunas'], (tabelas, bloco['desconhecido'])))
+            else:
+                tabelas = [_tabela(c, cats, int) for c, cats in zip(bloco['colunas'], bloco['categorias'])]
+                self._etapas.append(('onehot', bloco['colunas'], (tabelas, bloco['ignorar_desconhecido'])))
+        self.n_features = sum(
+            len(cols) if tipo != 'onehot' else sum(len(set(t.values())) for t in params[0])
+            for tipo, cols, params in self._etapas
+        )
+
+    def transformar(self, dados):
+        # Equivalente ao ColumnTransformer.transform: devolve a matriz float64
+        # na mesma ordem de colunas que a floresta viu no treino
+        colunas = {c: np.asarray(dados[c]) for c in self.colunas}
+        n = len(colunas[self.colunas[0]])
+        X = np.zeros((n, self.n_features), dtype=np.float64)
+        j = 0
+        for tipo, cols, params in self._etapas:
+            if tipo == 'numerico':
+                arredondar, media, escala = params
+                for k, c in enumerate(cols):
+                    x = colunas[c].astype(np.float64)
+                    if arredondar[k]:
+                        x = np.round(x).astype(np.int64)
+                    X[:, j] = x
+                    j += 1
+                bloco = X[:, j - len(cols):j]
+                bloco -= media
+                bloco /= escala
+            elif tipo == 'ordinal':
+                tabelas, desconhecido = params
+                for c, tabela in zip(cols, tabelas):
+                    codigos = [tabela.get(v, desconhecido) for v in colunas[c].tolist()]
+                    if desconhecido is None and None in codigos:
+                        raise ValueError(f"Categoria desconhecida em '{c}'.")
+                    X[:, j] = codigos
+                    j += 1
+            else:
+                tabelas, ignorar = params
+                linhas = np.arange(n)
+                for c, tabela in zip(cols, tabelas):
+                    posicoes = np.array([tabela.get(v, -1) for v in colunas[c].tolist()], dtype=np.int64)
+                    conhecidas = posicoes >= 0
+                    if not ignorar and not conhecidas.all():
+                        raise ValueError(f"Categoria desconhecida em '{c}'.")
+                    X[linhas[conhecidas], j + posicoes[conhecidas]] = 1.0
+                    j += len(set(tabela.values()))
+        return X
+
+    def _percorrer(self, X32):
+        n = X32.shape[0]
+        linhas = np.arange(n)[:, np.newaxis]
+        no = np.broadcast_to(self.raizes, (n, len(self.raizes))).copy()
+        for _ in range(self.profundidade):
+            vai_esquerda = X32[linhas, self.feature[no]] <= self.limiar[no]
+            no = self._filhos[no, vai_esquerda.view(np.int8)]
+        # Soma acumulada árvore a árvore (mesma ordem de soma do scikit-learn)
+        return self.valores[no].cumsum(axis=1)[:, -1, :] / len(self.raizes)
+
+    def predict_proba(self, dados):
+        # Os nós da árvore comparam features em float32, como no scikit-learn
+        X32 = self.transformar(dados).astype(np.float32)
+        if X32.shape[0] <= LINHAS_POR_BLOCO:
+            return self._percorrer(X32)
+        return np.concatenate([
+            self._percorrer(X32[i:i + LINHAS_POR_BLOCO])
+            for i in range(0, X32.shape[0], LINHAS_POR_BLOCO)
+        ])
+
+    def predict(self, dados):
+        return self.classes_.take(np.argmax(self.predict_proba(dados), axis=1))
+
+    def salvar(self, caminho):
+        np.savez(
+            caminho,
+            feature=self.feature, limiar=self.limiar,
+            esquerda=self.esquerda, direita=self.direita,
+            valores=self.valores, raizes=self.raizes,
+            metadados=np.frombuffer(json.dumps(self.metadados).encode('utf-8'), dtype=np.uint8),
+        )
+
+    @classmethod
+    def carregar(cls, caminho):
+        with np.load(caminho, allow_pickle=False) as arq:
+            metadados = json.loads(arq['metadados'].tobytes().decode('utf-8'))
+            return cls(
+                feature=arq['feature'], limiar=arq['limiar'],
+                esquerda=arq['esquerda'], direita=arq['direita'],
+                valores=arq['valores'], raizes=arq['raizes'],
+                metadados=metadados,
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compila o pipeline .pkl em uma floresta NumPy (.npz).")
+    parser.add_argument('modelo', help="Pipeline .pkl de origem")
+    parser.add_argument('saida', help="Arquivo .npz de destino")
+    parser.add_argument('--verificar', default='data/Obesity.csv',
+                        help="CSV usado para conferir as previsões (vazio para pular)")
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+    from obesidade.registro import registro_modelos
+
+    pipeline = registro_modelos.obter(args.modelo).modelo
+    compilada = compilar_pipeline(pipeline)
+    compilada.salvar(args.saida)
+    print(f"Floresta compilada: {len(compilada.raizes)} árvores, {len(compilada.feature):,} nós -> '{args.saida}'")
+
+    if args.verificar:
+        compilada = FlorestaCompilada.carregar(args.saida)
+        X = pd.read_csv(args.verificar)[compilada.colunas]
+        iguais = np.array_equal(pipeline.predict_proba(X), compilada.predict_proba(X))
+        print(f"Probabilidades idênticas ao pipeline: {'SIM' if iguais else 'NÃO'}")
+
+        linha = X.iloc[:1]
+        registro = {c: [v] for c, v in linha.iloc[0].items()}
+        repeticoes = 50
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            pipeline.predict(linha)
+        t_pipeline = (time.perf_counter() - inicio) / repeticoes
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            compilada.predict(registro)
+        t_compilada = (time.perf_counter() - inicio) / repeticoes
+        print(f"Latência por linha: pipeline {t_pipeline * 1000:.2f}ms | "
+              f"compilada {t_compilada * 1000:.3f}ms ({t_pipeline / t_compilada:.0f}x)")
+        if not iguais:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
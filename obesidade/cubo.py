@@ -0,0 +1,222 @@
+"""Cubo de agregados pré-calculado para o Dashboard Analítico.
+
+Cada célula do cubo é uma combinação das dimensões filtráveis e das
+dimensões usadas nos gráficos, com a contagem de pacientes e as somas e
+somas de quadrados das variáveis numéricas. Para os gráficos de
+distribuição (violino e boxplot) o cubo guarda também histogramas de
+largura fixa por célula.
+
+Uma mudança de filtro vira uma seleção de células seguida de somas, ou
+seja, custa O(células) e não O(linhas) da base.
+"""
+import numpy as np
+import pandas as pd
+
+# Filtros da sidebar + dimensões cruzadas nos gráficos (CAEC e SMOKE)
+dimensoes_filtro = ['Gender', 'family_history', 'Faixa_Etaria', 'MTRANS']
+dimensoes_cubo = dimensoes_filtro + ['Obesity', 'Obesity_PT', 'CAEC', 'SMOKE']
+medidas_cubo = ['Age', 'Height', 'Weight', 'IMC', 'FCVC', 'NCP', 'CH2O', 'FAF', 'TUE']
+
+# Colunas da base necessárias para montar o cubo (IMC é calculado)
+colunas_dashboard = dimensoes_cubo + [m for m in medidas_cubo if m != 'IMC']
+
+# Largura dos intervalos dos histogramas (violino de TUE e boxplot de Idade)
+resolucao_histograma = {'Age': 1.0, 'TUE': 0.05}
+
+
+def _preparar_base(df):
+    base = df.copy()
+    # Somas em float64 mesmo quando a base vem tipada em float32
+    numericas = [m for m in medidas_cubo if m != 'IMC']
+    base[numericas] = base[numericas].astype('float64')
+    base['IMC'] = base['Weight'] / (base['Height'] ** 2)
+    # O filtro de faixa etária da sidebar trabalha com os rótulos em texto
+    base['Faixa_Etaria'] = base['Faixa_Etaria'].astype(str)
+    return base
+
+
+class CuboAgregado:
+    def __init__(self, celulas, histogramas, valores_dimensao, resolucao):
+        self.celulas = celulas
+        self.histogramas = histogramas
+        self.valores_dimensao = valores_dimensao
+        self.resolucao = resolucao
+
+    @classmethod
+    def de_dataframe(cls, df, resolucao=None):
+        resolucao = dict(resolucao_histograma if resolucao is None else resolucao)
+        base = _preparar_base(df)
+        celulas = cls._agregar(base)
+        histogramas = {m: cls._histograma(base, m, r) for m, r in resolucao.items()}
+        # Ordem de primeira aparição, igual a df[col].unique() usado nos filtros
+        valores = {d: list(pd.unique(base[d])) for d in dimensoes_cubo}
+        return cls(celulas, histogramas, valores, resolucao)
+
+    @staticmethod
+    def _agregar(base):
+        tabela = pd.concat([
+            base[dimensoes_cubo],
+            base[medidas_cubo].add_prefix('soma_'),
+            (base[medidas_cubo] ** 2).add_prefix('soma2_'),
+        ], axis=1)
+        tabela['n'] = 1
+        return (tabela.groupby(dimensoes_cubo, dropna=False, sort=False, observed=True)
+                .sum().reset_index())
+
+    @staticmethod
+    def _histograma(base, medida, largura):
+        tabela = base[dimensoes_cubo].copy()
+        tabela['intervalo'] = np.floor(base[medida] / largura + 0.5).astype('int64')
+        return (tabela.groupby(dimensoes_cubo + ['intervalo'], dropna=False, sort=False, observed=True)
+                .size().rename('n').reset_index())
+
+    def combinar(self, outro):
+        # Soma célula a célula com outro cubo (ex.: o de um lote de pacientes novos).
+        # Custa O(células dos dois cubos), independente do histórico já agregado.
+        if outro.resolucao != self.resolucao:
+            raise ValueError("Cubos com resoluções de histograma diferentes não podem ser combinados")
+
+        def somar(atual, novo, chaves):
+            novo = novo.copy()
+            for col in chaves:
+                # Mantém o tipo (e a ordem das categorias) do cubo atual
+                if isinstance(atual[col].dtype, pd.CategoricalDtype):
+                    novo[col] = novo[col].astype(atual[col].dtype)
+            return (pd.concat([atual, novo], ignore_index=True)
+                    .groupby(chaves, dropna=False, sort=False, observed=True).sum().reset_index())
+
+        celulas = somar(self.celulas, outro.celulas, dimensoes_cubo)
+        histogramas = {m: somar(h, outro.histogramas[m], dimensoes_cubo + ['intervalo'])
+                       for m, h in self.histogramas.items()}
+        valores = {d: v + [x for x in outro.valores_dimensao[d] if x not in v]
+                   for d, v in self.valores_dimensao.items()}
+        return CuboAgregado(celulas, histogramas, valores, self.resolucao)
+
+    @property
+    def assinatura(self):
+        # Identifica o conteúdo do cubo (muda quando os dados mudam); usada
+        # para invalidar caches derivados, como o de figuras
+        if getattr(self, '_assinatura', None) is None:
+            hashes = pd.util.hash_pandas_object(self.celulas, index=False).to_numpy()
+            self._assinatura = f"{len(self.celulas)}-{int(hashes.sum(dtype=np.uint64))}"
+        return self._assinatura
+
+    # --- SELEÇÃO ---
+
+    def filtrar(self, filtros):
+        # filtros: {dimensão: valores aceitos}
+        def mascara(tabela):
+            m = np.ones(len(tabela), dtype=bool)
+            for col, aceitos in filtros.items():
+                m &= tabela[col].isin(list(aceitos)).to_numpy()
+            return m
+        celulas = self.celulas[mascara(self.celulas)]
+        histogramas = {k: h[mascara(h)] for k, h in self.histogramas.items()}
+        return CuboAgregado(celulas, histogramas, self.valores_dimensao, self.resolucao)
+
+    def projetar(self, dimensoes, medidas=(), histogramas=()):
+        # Cubo só com as dimensões, medidas e histogramas pedidos (as demais
+        # dimensões são somadas). Responde às mesmas consultas sobre essas
+        # colunas com muito menos células, mas não pode mais ser filtrado
+        dimensoes = list(dimensoes)
+        cols = [f'{p}_{m}' for m in medidas for p in ('soma', 'soma2')] + ['n']
+        celulas = (self.celulas.groupby(dimensoes, dropna=False, sort=False, observed=True)[cols]
+                   .sum().reset_index())
+        hist = {m: (self.histogramas[m]
+                    .groupby(dimensoes + ['intervalo'], dropna=False, sort=False, observed=True)['n']
+                    .sum().reset_index())
+                for m in histogramas}
+        valores = {d: self.valores_dimensao[d] for d in dimensoes}
+        return CuboAgregado(celulas, hist, valores, {m: self.resolucao[m] for m in histogramas})
+
+    def valores(self, dimensao):
+        return list(self.valores_dimensao[dimensao])
+
+    # --- CONSULTAS (somas de células) ---
+
+    def total(self):
+        return int(self.celulas['n'].sum())
+
+    def contagem(self, por):
+        return self.celulas.groupby(por, sort=False, observed=True)['n'].sum()
+
+    def tabela(self, linhas, colunas, normalizar=False):
+        # Equivalente a pd.crosstab(df[linhas], df[colunas])
+        ct = self.celulas.pivot_table(index=linhas, columns=colunas, values='n',
+                                      aggfunc='sum', fill_value=0, observed=True)
+        ct = ct.astype('int64')
+        ct.index.name, ct.columns.name = linhas, colunas
+        if normalizar:
+            return ct.div(ct.sum(axis=1), axis=0)
+        return ct
+
+    def media(self, medida, por=None):
+        if por is None:
+            n = self.celulas['n'].sum()
+            return self.celulas[f'soma_{medida}'].sum() / n if n else float('nan')
+        g = self.celulas.groupby(por, sort=False, observed=True)[[f'soma_{medida}', 'n']].sum()
+        return g[f'soma_{medida}'] / g['n']
+
+    def desvio(self, medida, por=None):
+        cols = [f'soma_{medida}', f'soma2_{medida}', 'n']
+        if por is None:
+            s, s2, n = self.celulas[cols].sum()
+        else:
+            g = self.celulas.groupby(por, sort=False, observed=True)[cols].sum()
+            s, s2, n = g[cols[0]], g[cols[1]], g['n']
+        return np.sqrt((s2 - s ** 2 / n) / (n - 1))
+
+    def histograma(self, medida, por):
+        # {categoria: (valores centrais dos intervalos, contagens)}
+        h = self.histogramas[medida]
+        largura = self.resolucao[medida]
+        g = h.groupby([por, 'intervalo'], sort=True, observed=True)['n'].sum()
+        saida = {}
+        # observed=True: categorias sem linhas na seleção atual ficam de fora
+        for categoria, serie in g.groupby(level=0, sort=False, observed=True):
+            if not serie.sum():
+                continue
+            saida[categoria] = (serie.index.get_level_values(1).to_numpy() * largura,
+                                serie.to_numpy())
+        return saida
+
+
+# --- ESTATÍSTICAS A PARTIR DE HISTOGRAMAS ---
+
+def _quantil(valores, contagens, q):
+    # Mesmo critério de np.quantile (interpolação linear) sobre os dados expandidos
+    acumulado = np.cumsum(contagens)
+    pos = q * (acumulado[-1] - 1)
+    baixo, alto = int(np.floor(pos)), int(np.ceil(pos))
+    v_baixo = valores[np.searchsorted(acumulado, baixo, side='right')]
+    v_alto = valores[np.searchsorted(acumulado, alto, side='right')]
+    return v_baixo + (v_alto - v_baixo) * (pos - baixo)
+
+
+def estatisticas_boxplot(valores, contagens, whis=1.5):
+    # Formato aceito por Axes.bxp
+    q1, med, q3 = (_quantil(valores, contagens, q) for q in (0.25, 0.5, 0.75))
+    iqr = q3 - q1
+    dentro = (valores >= q1 - whis * iqr) & (valores <= q3 + whis * iqr)
+    return {
+        'med': med, 'q1': q1, 'q3': q3,
+        'whislo': valores[dentro].min() if dentro.any() else q1,
+        'whishi': valores[dentro].max() if dentro.any() else q3,
+        'fliers': valores[~dentro],
+        'mean': np.average(valores, weights=contagens),
+    }
+
+
+def densidade_kde(valores, contagens, corte=2.0, pontos=100):
+    # KDE gaussiana com banda de Scott (a mesma do seaborn), calculada
+    # sobre os intervalos do histograma em vez das linhas originais
+    n = contagens.sum()
+    media = np.average(valores, weights=contagens)
+    var = np.sum(contagens * (valores - media) ** 2) / max(n - 1, 1)
+    banda = np.sqrt(var) * n ** (-1 / 5)
+    if not np.isfinite(banda) or banda <= 0:
+        banda = 1e-3
+    grade = np.linspace(valores.min() - corte * banda, valores.max() + corte * banda, pontos)
+    z = (grade[:, np.newaxis] - valores[np.newaxis, :]) / banda
+    dens = (np.exp(-0.5 * z ** 2) * contagens).sum(axis=1) / (n * banda * np.sqrt(2 * np.pi))
+    return grade, dens
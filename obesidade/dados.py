@@ -0,0 +1,155 @@
+"""Leitura da base de pacientes e conversão para o formato colunar tipado.
+
+O CSV é convertido uma única vez para um arquivo Arrow IPC (Feather v2,
+sem compressão) com tipos fixos: categóricas com vocabulário conhecido,
+float32 nas numéricas e as colunas derivadas (Obesity_PT, Faixa_Etaria)
+já materializadas. Esse formato pode ser mapeado em memória e lido só
+nas colunas necessárias, evitando reprocessar o CSV a cada inicialização.
+
+Conversão:
+    python -m obesidade.dados data/Obesity.csv data/Obesity.arrow
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from obesidade.nucleo import cols_numericas, ordem_obesidade, traducao_resultado
+
+bins_faixa_etaria = [0, 19, 29, 45, 60, 100]
+labels_faixa_etaria = ['0-19 (Jovens)', '20-29 (Adultos Jovens)', '30-45 (Adultos)', '46-60 (Meia Idade)', '60+ (Idosos)']
+
+# Vocabulário fixo de cada coluna categórica (dicionário de dados do Obesity.csv)
+categorias = {
+    'Gender': ['Female', 'Male'],
+    'family_history': ['no', 'yes'],
+    'FAVC': ['no', 'yes'],
+    'CAEC': ['no', 'Sometimes', 'Frequently', 'Always'],
+    'SMOKE': ['no', 'yes'],
+    'SCC': ['no', 'yes'],
+    'CALC': ['no', 'Sometimes', 'Frequently', 'Always'],
+    'MTRANS': ['Public_Transportation', 'Walking', 'Automobile', 'Motorbike', 'Bike'],
+    'Obesity': list(traducao_resultado.keys()),
+    'Obesity_PT': ordem_obesidade,
+    'Faixa_Etaria': labels_faixa_etaria,
+}
+
+colunas_csv = ['Gender', 'Age', 'Height', 'Weight', 'family_history', 'FAVC', 'FCVC', 'NCP',
+               'CAEC', 'SMOKE', 'CH2O', 'SCC', 'FAF', 'TUE', 'CALC', 'MTRANS', 'Obesity']
+
+CAMINHO_COLUNAR = 'data/Obesity.arrow'
+
+
+def derivar_colunas(df):
+    # Colunas usadas pelo dashboard, calculadas sobre os valores originais
+    # (antes da conversão para float32, para não deslocar limites das faixas)
+    if 'Obesity' in df.columns:
+        df['Obesity_PT'] = df['Obesity'].map(traducao_resultado)
+    if 'Age' in df.columns:
+        df['Faixa_Etaria'] = pd.cut(df['Age'], bins=bins_faixa_etaria, labels=labels_faixa_etaria)
+    return df
+
+
+def tipar(df):
+    for col in cols_numericas:
+        if col in df.columns:
+            df[col] = df[col].astype(np.float32)
+    for col, cats in categorias.items():
+        if col not in df.columns:
+            continue
+        valores = df[col].astype(object)
+        tipado = pd.Categorical(valores, categories=cats, ordered=(col == 'Faixa_Etaria'))
+        fora = pd.isna(tipado) & pd.notna(valores)
+        if fora.any():
+            invalidos = sorted(set(map(str, valores[fora])))
+            raise ValueError(f"Valores fora do vocabulário em '{col}': {invalidos}")
+        df[col] = tipado
+    return df
+
+
+def converter_csv(origem, destino, tamanho_bloco=500_000):
+    # Conversão em blocos: o CSV nunca é carregado inteiro na memória.
+    # Como as categorias são fixas, todos os blocos compartilham o mesmo dicionário.
+    import pyarrow as pa
+
+    # Grava num temporário e só troca no fim: uma falha no meio (valor fora do
+    # vocabulário, disco cheio) não deixa um .arrow parcial mais novo que o
+    # CSV, que arquivo_base passaria a preferir
+    temporario = destino + '.tmp'
+    escritor = None
+    linhas = 0
+    try:
+        for bloco in pd.read_csv(origem, chunksize=tamanho_bloco):
+            tabela = pa.Table.from_pandas(tipar(derivar_colunas(bloco)), preserve_index=False)
+            if escritor is None:
+                escritor = pa.ipc.new_file(temporario, tabela.schema)
+            escritor.write_table(tabela)
+            linhas += len(bloco)
+        if escritor is not None:
+            escritor.close()
+            escritor = None
+            os.replace(temporario, destino)
+    except BaseException:
+        if escritor is not None:
+            escritor.close()
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    return linhas
+
+
+def carregar_colunar(caminho=CAMINHO_COLUNAR, colunas=None):
+    # memory_map: o sistema operacional pagina só as colunas efetivamente lidas
+    from pyarrow import feather
+    tabela = feather.read_table(caminho, columns=colunas, memory_map=True)
+    return tabela.to_pandas()
+
+
+def carregar_csv(caminho, colunas=None):
+    leitura = None
+    if colunas:
+        # Colunas de origem necessárias, incluindo as usadas nas derivadas
+        necessarias = set(colunas)
+        if 'Obesity_PT' in necessarias:
+            necessarias.add('Obesity')
+        if 'Faixa_Etaria' in necessarias:
+            necessarias.add('Age')
+        leitura = [c for c in colunas_csv if c in necessarias]
+    df = tipar(derivar_colunas(pd.read_csv(caminho, usecols=leitura)))
+    return df[colunas] if colunas else df
+
+
+def arquivo_base(caminho_csv, caminho_colunar=None):
+    # Arquivo efetivamente usado: o colunar quando existe e está atualizado em relação ao CSV
+    if caminho_colunar is None:
+        caminho_colunar = os.path.splitext(caminho_csv)[0] + '.arrow'
+    if os.path.exists(caminho_colunar) and (
+            not os.path.exists(caminho_csv)
+            or os.path.getmtime(caminho_colunar) >= os.path.getmtime(caminho_csv)):
+        return caminho_colunar
+    return caminho_csv
+
+
+def carregar_base(caminho_csv, colunas=None, caminho_colunar=None):
+    caminho = arquivo_base(caminho_csv, caminho_colunar)
+    if caminho.endswith('.arrow'):
+        return carregar_colunar(caminho, colunas)
+    return carregar_csv(caminho, colunas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Converte o Obesity.csv para o formato colunar tipado (Arrow).")
+    parser.add_argument('origem', nargs='?', default='data/Obesity.csv')
+    parser.add_argument('destino', nargs='?', default=CAMINHO_COLUNAR)
+    parser.add_argument('--tamanho-bloco', type=int, default=500_000, help="Linhas por bloco na conversão")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    linhas = converter_csv(args.origem, args.destino, args.tamanho_bloco)
+    print(f"{linhas:,} linhas convertidas em {time.perf_counter() - inicio:.2f}s -> '{args.destino}'")
+
+
+if __name__ == '__main__':
+    main()
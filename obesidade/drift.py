@@ -0,0 +1,275 @@
+"""Monitoramento de deriva (drift) das entradas e das previsões.
+
+No treino, salvar_artefato grava ao lado do modelo uma linha de base
+(<modelo>.drift.json): para cada numérica, limites de faixas fixas (os
+decis da base de treino) e a contagem de linhas em cada faixa; para cada
+categórica, a contagem de cada valor; e a distribuição das classes
+previstas no conjunto de teste.
+
+Em produção, MonitorDrift acumula os mesmos esboços sobre as linhas
+pontuadas (simulador, serviço e lote): cada linha custa uma busca binária
+por numérica e um incremento por categórica, sem guardar as linhas. As
+pontuações comparam o acumulado com a linha de base:
+  - PSI (population stability index) em todas as variáveis e nas classes
+    previstas. Faixas usuais: < 0,1 estável, 0,1 a 0,25 moderado, > 0,25
+    significativo;
+  - KS nas numéricas: maior distância entre as distribuições acumuladas,
+    calculada nas faixas (um limite inferior do KS exato).
+
+Linha de base de um modelo já treinado e relatório de um arquivo:
+    python -m obesidade.drift models/modelo_obesidade.pkl --dados data/Obesity.csv
+    python -m obesidade.drift models/modelo_obesidade.pkl --comparar novos_pacientes.csv
+"""
+import argparse
+import bisect
+import json
+import os
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from obesidade.nucleo import cols_nominais, cols_numericas, cols_ordinais, mapas_por_coluna
+
+FAIXAS_PADRAO = 10
+
+# Abaixo disso as pontuações são dominadas pelo ruído da amostra
+LINHAS_MINIMAS = 100
+
+# Proporção mínima usada no PSI, para faixas vazias em um dos lados
+_PROPORCAO_MINIMA = 1e-4
+
+niveis_psi = ((0.25, 'significativo'), (0.1, 'moderado'), (0.0, 'estavel'))
+
+cols_categoricas = cols_ordinais + cols_nominais
+
+
+def caminho_linha_de_base(caminho_modelo):
+    return os.path.splitext(caminho_modelo)[0] + '.drift.json'
+
+
+def _limites(valores, faixas):
+    # Limites internos nos quantis da base (faixas com massa parecida); as pontas vão ao infinito
+    valores = np.asarray(valores, dtype=float)
+    valores = valores[~np.isnan(valores)]
+    if not len(valores):
+        return []
+    return np.unique(np.quantile(valores, np.linspace(0, 1, faixas + 1)[1:-1])).tolist()
+
+
+def _proporcoes(contagens):
+    contagens = np.asarray(contagens, dtype=float)
+    total = contagens.sum()
+    if not total:
+        return np.full(len(contagens), 1.0 / max(len(contagens), 1))
+    return contagens / total
+
+
+def psi(esperado, observado):
+    pe = np.maximum(_proporcoes(esperado), _PROPORCAO_MINIMA)
+    po = np.maximum(_proporcoes(observado), _PROPORCAO_MINIMA)
+    return float(np.sum((po - pe) * np.log(po / pe)))
+
+
+def ks(esperado, observado):
+    return float(np.abs(np.cumsum(_proporcoes(esperado)) - np.cumsum(_proporcoes(observado))).max())
+
+
+def nivel_psi(valor):
+    for limite, nivel in niveis_psi:
+        if valor >= limite:
+            return nivel
+    return niveis_psi[-1][1]
+
+
+def _alinhar(esperado, observado):
+    chaves = sorted(set(esperado) | set(observado))
+    return [esperado.get(c, 0) for c in chaves], [observado.get(c, 0) for c in chaves]
+
+
+class MonitorDrift:
+    """Histogramas de faixas fixas (numéricas) e contadores (categóricas e classes)."""
+
+    def __init__(self, limites, referencia=None):
+        # limites: {numérica: limites internos}; referencia: instantâneo da linha de base
+        self.limites = {c: [float(v) for v in limites[c]] for c in cols_numericas}
+        self._limites_np = {c: np.asarray(v) for c, v in self.limites.items()}
+        self.referencia = referencia
+        self._lock = threading.Lock()
+        self.limpar()
+
+    @classmethod
+    def para_dados(cls, X, faixas=FAIXAS_PADRAO):
+        # Monitor vazio com as faixas tiradas de uma amostra dos dados de treino
+        return cls({c: _limites(pd.to_numeric(X[c], errors='coerce'), faixas) for c in cols_numericas})
+
+    @classmethod
+    def de_linha_de_base(cls, base):
+        return cls({c: base['numericas'][c]['limites'] for c in cols_numericas}, referencia=base)
+
+    def limpar(self):
+        with self._lock:
+            self.linhas = 0
+            self.numericas = {c: np.zeros(len(l) + 1, dtype=np.int64) for c, l in self.limites.items()}
+            self.categoricas = {c: Counter() for c in cols_categoricas}
+            self.classes = Counter()
+
+    def observar(self, X, previsto=None):
+        # Lote (DataFrame no esquema do Obesity.csv ou com os rótulos do formulário):
+        # uma busca binária vetorizada por numérica e value_counts por categórica
+        faixas = {}
+        for c in cols_numericas:
+            valores = pd.to_numeric(X[c], errors='coerce').to_numpy(dtype=float)
+            valores = valores[~np.isnan(valores)]
+            faixas[c] = np.bincount(np.searchsorted(self._limites_np[c], valores, side='right'),
+                                    minlength=len(self.limites[c]) + 1)
+        # dropna=False é bem mais rápido em colunas de texto; os nulos são descartados abaixo
+        contagens = {c: X[c].value_counts(sort=False, dropna=False) for c in cols_categoricas if c in X.columns}
+        with self._lock:
+            self.linhas += len(X)
+            for c, n in faixas.items():
+                self.numericas[c] += n
+            for c, contagem in contagens.items():
+                mapa = mapas_por_coluna.get(c, {})
+                destino = self.categoricas[c]
+                for valor, n in contagem.items():
+                    if n and not pd.isna(valor):
+                        destino[str(mapa.get(valor, valor))] += int(n)
+        if previsto is not None:
+            self.observar_classes(previsto)
+
+    def observar_classes(self, previsto):
+        contagem = pd.Series(previsto).value_counts(sort=False, dropna=False)
+        with self._lock:
+            for classe, n in contagem.items():
+                if n and not pd.isna(classe):
+                    self.classes[str(classe)] += int(n)
+
+    def observar_registro(self, registro, classe=None):
+        # Uma linha (dict), sem pandas nem NumPy: custo de microssegundos
+        with self._lock:
+            self.linhas += 1
+            for c in cols_numericas:
+                self.numericas[c][bisect.bisect_right(self.limites[c], float(registro[c]))] += 1
+            for c in cols_categoricas:
+                valor = registro[c]
+                self.categoricas[c][str(mapas_por_coluna.get(c, {}).get(valor, valor))] += 1
+            if classe is not None:
+                self.classes[str(classe)] += 1
+
+    def instantaneo(self):
+        # Estado atual em JSON (o formato da linha de base)
+        with self._lock:
+            return {
+                'linhas': self.linhas,
+                'numericas': {c: {'limites': self.limites[c], 'contagens': self.numericas[c].tolist()}
+                              for c in cols_numericas},
+                'categoricas': {c: dict(self.categoricas[c]) for c in cols_categoricas},
+                'classes': dict(self.classes),
+            }
+
+    def pontuacoes(self):
+        # Uma linha por variável (e uma para as classes previstas), maior PSI primeiro
+        if self.referencia is None:
+            raise ValueError("Monitor sem linha de base para comparar.")
+        atual, base = self.instantaneo(), self.referencia
+        linhas = []
+        for c in cols_numericas:
+            esperado, observado = base['numericas'][c]['contagens'], atual['numericas'][c]['contagens']
+            linhas.append({'variavel': c, 'tipo': 'numerica',
+                           'psi': psi(esperado, observado), 'ks': ks(esperado, observado)})
+        for c in cols_categoricas:
+            esperado, observado = _alinhar(base['categoricas'][c], atual['categoricas'][c])
+            linhas.append({'variavel': c, 'tipo': 'categorica', 'psi': psi(esperado, observado), 'ks': None})
+        if atual['classes']:
+            esperado, observado = _alinhar(base['classes'], atual['classes'])
+            linhas.append({'variavel': 'classe_prevista', 'tipo': 'previsao',
+                           'psi': psi(esperado, observado), 'ks': None})
+        for linha in linhas:
+            linha['nivel'] = nivel_psi(linha['psi'])
+        return sorted(linhas, key=lambda linha: -linha['psi'])
+
+    def relatorio(self):
+        pontuacoes = self.pontuacoes() if self.linhas else []
+        return {
+            'linhas': self.linhas,
+            'linhas_base': self.referencia['linhas'],
+            'amostra_suficiente': self.linhas >= LINHAS_MINIMAS,
+            'psi_maximo': pontuacoes[0]['psi'] if pontuacoes else 0.0,
+            'variaveis': pontuacoes,
+        }
+
+
+def linha_de_base(X, previsto=None, faixas=FAIXAS_PADRAO):
+    monitor = MonitorDrift.para_dados(X, faixas)
+    monitor.observar(X, previsto)
+    return monitor.instantaneo()
+
+
+def salvar_linha_de_base(base, caminho):
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(base, f, indent=1, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def carregar_linha_de_base(caminho):
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+_monitores = {}
+_lock_monitores = threading.Lock()
+
+
+def monitor_do_modelo(caminho_modelo):
+    # Um monitor por modelo e por processo (compartilhado entre sessões e
+    # requisições); None se o modelo não tem linha de base. Uma linha de base
+    # nova em disco (modelo republicado) recomeça o acúmulo.
+    caminho = caminho_linha_de_base(caminho_modelo)
+    try:
+        mtime = os.stat(caminho).st_mtime_ns
+    except OSError:
+        return None
+    with _lock_monitores:
+        atual = _monitores.get(caminho)
+        if atual is None or atual[0] != mtime:
+            atual = _monitores[caminho] = (mtime, MonitorDrift.de_linha_de_base(carregar_linha_de_base(caminho)))
+        return atual[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Linha de base e relatório de deriva do modelo de obesidade.")
+    parser.add_argument('modelo', help="Pipeline .pkl (a linha de base fica em <modelo>.drift.json)")
+    parser.add_argument('--dados', help="CSV de treino: grava a linha de base a partir dele")
+    parser.add_argument('--comparar', help="CSV ou Parquet pontuado contra a linha de base")
+    parser.add_argument('--faixas', type=int, default=FAIXAS_PADRAO, help="Faixas por numérica na linha de base")
+    args = parser.parse_args(argv)
+    if not args.dados and not args.comparar:
+        parser.error("Informe --dados e/ou --comparar.")
+
+    from obesidade.lote import ler_blocos
+    from obesidade.nucleo import cols_modelo, traduzir_entrada
+    from obesidade.registro import registro_modelos
+
+    pipeline = registro_modelos.obter(args.modelo).modelo
+    caminho = caminho_linha_de_base(args.modelo)
+    if args.dados:
+        X = pd.read_csv(args.dados, usecols=cols_modelo)
+        salvar_linha_de_base(linha_de_base(X, pipeline.predict(X), args.faixas), caminho)
+        print(f"Linha de base de {len(X):,} linhas -> '{caminho}'")
+
+    if args.comparar:
+        monitor = MonitorDrift.de_linha_de_base(carregar_linha_de_base(caminho))
+        for bloco in ler_blocos(args.comparar, 100_000):
+            monitor.observar(bloco, pipeline.predict(traduzir_entrada(bloco[cols_modelo])))
+        relatorio = monitor.relatorio()
+        print(f"{relatorio['linhas']:,} linhas comparadas com {relatorio['linhas_base']:,} da linha de base")
+        for linha in relatorio['variaveis']:
+            ks_texto = f" | KS {linha['ks']:.3f}" if linha['ks'] is not None else ''
+            print(f"  {linha['variavel']:<16} PSI {linha['psi']:.3f}{ks_texto}  [{linha['nivel']}]")
+
+
+if __name__ == '__main__':
+    main()
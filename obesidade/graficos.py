@@ -0,0 +1,226 @@
+"""Os nove gráficos do Dashboard Analítico.
+
+Cada função recebe o cubo já filtrado (obesidade.cubo.CuboAgregado) e
+devolve a figura pronta, ou None quando não há o que desenhar. Todas as
+chamadas usam o Axes explícito, sem depender do "gráfico atual" do pyplot.
+"""
+import io
+
+import matplotlib.pyplot as plt
+import numpy as np
+import seaborn as sns
+
+from obesidade.cubo import densidade_kde, estatisticas_boxplot
+from obesidade.nucleo import ordem_obesidade, traducao_resultado
+
+# Verde (abaixo do peso) a vermelho (obesidade mórbida), na ordem de ordem_obesidade
+cores_obesidade = ['#2ecc71', '#27ae60', '#f1c40f', '#f39c12', '#e67e22', '#d35400', '#c0392b']
+
+
+# --- CONFIGURAÇÃO GLOBAL DE GRÁFICOS ---
+def aplicar_tema():
+    sns.set_theme(style="ticks")
+    plt.rcParams['figure.facecolor'] = 'none'
+    plt.rcParams['axes.facecolor'] = 'none'
+    plt.rcParams['savefig.facecolor'] = 'none'
+    plt.rcParams['axes.spines.top'] = False
+    plt.rcParams['axes.spines.right'] = False
+    plt.rcParams['text.color'] = '#2c3e50'
+    plt.rcParams['axes.labelcolor'] = '#2c3e50'
+    plt.rcParams['xtick.color'] = '#2c3e50'
+    plt.rcParams['ytick.color'] = '#2c3e50'
+
+
+def _eixo_categorias_y(ax):
+    # Mesma disposição do seaborn para categorias no eixo y (primeira no topo)
+    ax.set_yticks(range(len(ordem_obesidade)))
+    ax.set_yticklabels(ordem_obesidade)
+    ax.set_ylim(len(ordem_obesidade) - 0.5, -0.5)
+
+
+def grafico_distribuicao(cubo):
+    fig, ax = plt.subplots(figsize=(8, 4))
+    contagem = cubo.contagem('Obesity_PT').reindex(ordem_obesidade).fillna(0)
+    sns.barplot(x=contagem.values, y=contagem.index, palette=cores_obesidade, ax=ax)
+    sns.despine(ax=ax, left=True, bottom=True)
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    return fig
+
+
+def grafico_genetica(cubo):
+    fam = cubo.contagem('family_history').sort_values(ascending=False)
+    if fam.empty:
+        return None
+    fig, ax = plt.subplots()
+    ax.pie(fam, labels=fam.index, autopct='%1.1f%%', colors=['#e74c3c', '#bdc3c7'], startangle=90)
+    return fig
+
+
+def grafico_transporte(cubo):
+    ct = cubo.tabela('MTRANS', 'Obesity_PT')
+    if ct.empty:
+        return None
+    ct_norm = ct.div(ct.sum(axis=1), axis=0)
+    fig, ax = plt.subplots(figsize=(8, 5))
+    sns.heatmap(ct_norm, cmap="RdYlGn_r", annot=True, fmt=".0%", cbar=False, ax=ax)
+    ax.set_ylabel("Meio de Transporte")
+    ax.set_xlabel("")
+    return fig
+
+
+def grafico_tecnologia(cubo):
+    fig, ax = plt.subplots(figsize=(8, 5))
+    # Violino desenhado a partir dos histogramas do cubo (KDE sobre os intervalos)
+    hist_tue = cubo.histograma('TUE', 'Obesity_PT')
+    cores = sns.color_palette("cool", len(ordem_obesidade), desat=0.75)
+    # Classes sem pacientes na seleção não têm violino
+    hist_tue = {cat: h for cat, h in hist_tue.items() if h[1].sum() > 0}
+    curvas = {cat: densidade_kde(*hist_tue[cat]) for cat in ordem_obesidade if cat in hist_tue}
+    escala = 0.4 / max(d.max() for _, d in curvas.values()) if curvas else 1.0
+    for i, cat in enumerate(ordem_obesidade):
+        if cat not in curvas:
+            continue
+        grade, dens = curvas[cat]
+        meia = dens * escala
+        ax.fill_between(grade, i - meia, i + meia, facecolor=cores[i], edgecolor='#444444', linewidth=1)
+        quartis = estatisticas_boxplot(*hist_tue[cat])
+        for chave, estilo in (('q1', ':'), ('med', '--'), ('q3', ':')):
+            xq = quartis[chave]
+            largura = np.interp(xq, grade, meia)
+            ax.plot([xq, xq], [i - largura, i + largura], color='#444444', linestyle=estilo, linewidth=1)
+    _eixo_categorias_y(ax)
+    ax.set_xlabel("Tempo em Dispositivos")
+    ax.set_ylabel("")
+    return fig
+
+
+def grafico_lanches(cubo):
+    ct_caec = cubo.tabela('Obesity_PT', 'CAEC')
+    fig, ax = plt.subplots(figsize=(8, 5))
+    sns.heatmap(ct_caec, cmap="Blues", annot=True, fmt="d", cbar=False, ax=ax)
+    ax.set_xlabel("Frequência de Lanches")
+    ax.set_ylabel("")
+    return fig
+
+
+def grafico_idade(cubo):
+    fig, ax = plt.subplots(figsize=(8, 5))
+    # Boxplot a partir dos histogramas de idade do cubo (intervalos de 1 ano)
+    hist_idade = cubo.histograma('Age', 'Obesity_PT')
+    cores = sns.color_palette("Spectral_r", len(ordem_obesidade), desat=0.75)
+    posicoes = [i for i, cat in enumerate(ordem_obesidade) if cat in hist_idade and hist_idade[cat][1].sum() > 0]
+    stats = [estatisticas_boxplot(*hist_idade[ordem_obesidade[i]]) for i in posicoes]
+    if stats:
+        caixas = ax.bxp(stats, positions=posicoes, vert=False, patch_artist=True, widths=0.8,
+                        medianprops={'color': '#444444'},
+                        flierprops={'marker': 'o', 'markerfacecolor': 'none', 'markersize': 5})
+        for caixa, i in zip(caixas['boxes'], posicoes):
+            caixa.set_facecolor(cores[i])
+    _eixo_categorias_y(ax)
+    ax.set_xlabel("Idade")
+    ax.set_ylabel("")
+    return fig
+
+
+def grafico_hidratacao(cubo):
+    fig, ax = plt.subplots()
+    agua = cubo.media('CH2O', 'Obesity_PT')
+    sns.barplot(x=agua.index, y=agua.values, order=ordem_obesidade, palette="Blues", ax=ax, errorbar=None)
+    plt.setp(ax.get_xticklabels(), rotation=90)
+    ax.set_xlabel("")
+    ax.set_ylabel("Litros/Dia")
+    return fig
+
+
+def grafico_tabagismo(cubo):
+    smoke_ct = cubo.tabela('Obesity_PT', 'SMOKE', normalizar=True)
+    fig, ax = plt.subplots()
+    smoke_ct.plot(kind='bar', stacked=True, color=['#bdc3c7', '#2c3e50'], ax=ax)
+    ax.legend(bbox_to_anchor=(1, 1))
+    plt.setp(ax.get_xticklabels(), rotation=90)
+    ax.set_xlabel("")
+    return fig
+
+
+def grafico_refeicoes(cubo):
+    fig, ax = plt.subplots()
+    # Média e IC 95% (aproximação normal) a partir das somas e somas de quadrados
+    refeicoes = cubo.media('NCP', 'Obesity_PT').reindex(ordem_obesidade)
+    erro = (1.96 * cubo.desvio('NCP', 'Obesity_PT')
+            / np.sqrt(cubo.contagem('Obesity_PT'))).reindex(ordem_obesidade)
+    sns.pointplot(x=refeicoes.index, y=refeicoes.values, order=ordem_obesidade, color="#e74c3c", ax=ax, errorbar=None)
+    ax.errorbar(range(len(ordem_obesidade)), refeicoes.values, yerr=erro.values, fmt='none', ecolor="#e74c3c")
+    plt.setp(ax.get_xticklabels(), rotation=90)
+    ax.set_xlabel("")
+    ax.set_ylabel("Refeições/Dia")
+    return fig
+
+
+# Ordem de exibição no dashboard
+graficos_dashboard = {
+    'distribuicao': grafico_distribuicao,
+    'genetica': grafico_genetica,
+    'transporte': grafico_transporte,
+    'tecnologia': grafico_tecnologia,
+    'lanches': grafico_lanches,
+    'idade': grafico_idade,
+    'hidratacao': grafico_hidratacao,
+    'tabagismo': grafico_tabagismo,
+    'refeicoes': grafico_refeicoes,
+}
+
+# O que cada gráfico consulta no cubo: (dimensões, medidas, histogramas).
+# O render paralelo envia a cada processo só essa projeção (CuboAgregado.projetar)
+agregados_graficos = {
+    'distribuicao': (['Obesity_PT'], [], []),
+    'genetica': (['family_history'], [], []),
+    'transporte': (['MTRANS', 'Obesity_PT'], [], []),
+    'tecnologia': (['Obesity_PT'], [], ['TUE']),
+    'lanches': (['Obesity_PT', 'CAEC'], [], []),
+    'idade': (['Obesity_PT'], [], ['Age']),
+    'hidratacao': (['Obesity_PT'], ['CH2O'], []),
+    'tabagismo': (['Obesity_PT', 'SMOKE'], [], []),
+    'refeicoes': (['Obesity_PT'], ['NCP'], []),
+}
+
+
+# Títulos dos eixos da análise de sensibilidade (mesmos textos do formulário)
+rotulos_sensibilidade = {
+    'FAF': "Ativ. Física (Dias/Semana)",
+    'CH2O': "Água (Litros/Dia)",
+    'FCVC': "Vegetais (1=Pouco, 3=Muito)",
+    'TUE': "Tempo Telas (0=Baixo, 2=Alto)",
+    'Weight': "Peso (kg)",
+}
+
+
+def grafico_sensibilidade(curvas, registro):
+    # Uma curva por classe em cada variável; a linha tracejada marca o paciente
+    fig, axes = plt.subplots(1, len(curvas), figsize=(4 * len(curvas), 3.6), sharey=True, squeeze=False)
+    cores = dict(zip(ordem_obesidade, cores_obesidade))
+    for ax, (variavel, curva) in zip(axes[0], curvas.items()):
+        for classe in curva.columns:
+            rotulo = traducao_resultado.get(classe, classe)
+            ax.plot(curva.index, curva[classe], color=cores.get(rotulo), label=rotulo, linewidth=2)
+        ax.axvline(registro[variavel], color='#7f8c8d', linestyle='--', linewidth=1)
+        ax.set_xlabel(rotulos_sensibilidade.get(variavel, variavel))
+        ax.set_ylim(0, 1)
+    axes[0][0].set_ylabel("Probabilidade")
+    alcas, rotulos = axes[0][0].get_legend_handles_labels()
+    ordem = sorted(range(len(rotulos)), key=lambda i: ordem_obesidade.index(rotulos[i]) if rotulos[i] in ordem_obesidade else len(ordem_obesidade))
+    fig.legend([alcas[i] for i in ordem], [rotulos[i] for i in ordem], loc='lower center',
+               ncol=len(rotulos), frameon=False, bbox_to_anchor=(0.5, -0.2))
+    return fig
+
+
+def renderizar(fig, formato='png', dpi=200):
+    # Converte a figura em bytes (mesmos parâmetros do st.pyplot) e a fecha,
+    # para que figuras não se acumulem no processo do servidor
+    if fig is None:
+        return b''
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=formato, dpi=dpi, bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
@@ -0,0 +1,207 @@
+"""Ingestão incremental de novos pacientes para o dashboard.
+
+Acompanha uma pasta de entrada (cada .csv novo é um lote) ou um único CSV
+que recebe linhas no final (lido a partir do último byte já processado).
+Cada lote é validado contra o esquema do Obesity.csv, ganha as colunas
+derivadas (Obesity_PT, Faixa_Etaria) e vira um cubo pequeno que é somado
+ao cubo do dashboard; o histórico nunca é reprocessado.
+
+Para evitar ler arquivos pela metade, grave o lote com outro nome (ou fora
+da pasta) e mova-o para a pasta de entrada quando estiver completo. Um CSV
+acompanhado que encolhe ou é trocado por outro arquivo não é relido: as
+linhas já somadas continuam no cubo, o evento vai para os rejeitados e a
+leitura segue a partir do fim do arquivo novo.
+"""
+import io
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from obesidade.cubo import CuboAgregado, colunas_dashboard
+from obesidade.dados import colunas_csv, derivar_colunas, tipar
+from obesidade.nucleo import cols_numericas
+
+PASTA_ENTRADA = 'data/entrada'
+
+
+def validar_lote(df):
+    # Mesmo esquema do Obesity.csv: todas as colunas, numéricas válidas e
+    # categóricas dentro do vocabulário (tipar levanta ValueError)
+    faltando = [c for c in colunas_csv if c not in df.columns]
+    if faltando:
+        raise ValueError(f"Colunas ausentes: {faltando}")
+    df = df[colunas_csv].copy()
+    vazias = [c for c in colunas_csv if df[c].isna().any()]
+    if vazias:
+        raise ValueError(f"Valores ausentes em: {vazias}")
+    for col in cols_numericas:
+        valores = pd.to_numeric(df[col], errors='coerce')
+        invalidas = valores.isna() | ~np.isfinite(valores)
+        if invalidas.any():
+            raise ValueError(f"Valores não numéricos em '{col}' (linhas {list(df.index[invalidas][:5])})")
+        df[col] = valores
+    if df['Height'].le(0).any():
+        raise ValueError("Altura deve ser positiva")
+    return tipar(derivar_colunas(df))
+
+
+class MonitorIngestao:
+    """Encontra registros novos num diretório de entrada ou num CSV que cresce."""
+
+    def __init__(self, caminho, desde_o_inicio=False):
+        self.caminho = caminho
+        self.eh_pasta = os.path.isdir(caminho)
+        self.processados = set()
+        self.rejeitados = []
+        self._deslocamento = 0
+        self._cabecalho = None
+        # (st_dev, st_ino) do CSV acompanhado, para notar quando ele é trocado
+        self._identidade = None
+        # Arquivos da pasta nunca fazem parte da base carregada, então são todos
+        # lidos; já um CSV acompanhado (ex.: o próprio Obesity.csv) só a partir
+        # do tamanho atual, pois o conteúdo existente já está na base
+        if not self.eh_pasta and not desde_o_inicio and os.path.exists(caminho):
+            info = os.stat(caminho)
+            self._ler_cabecalho()
+            self._identidade = (info.st_dev, info.st_ino)
+            self._deslocamento = info.st_size
+
+    def _arquivos(self):
+        return sorted(e.name for e in os.scandir(self.caminho)
+                      if e.is_file() and e.name.endswith('.csv') and not e.name.startswith('.'))
+
+    def _ler_cabecalho(self):
+        with open(self.caminho, 'rb') as f:
+            self._cabecalho = f.readline()
+
+    def verificar(self):
+        # Devolve uma lista de DataFrames já validados (vazia quando não há novidade)
+        if self.eh_pasta:
+            return self._verificar_pasta()
+        return self._verificar_arquivo()
+
+    def _verificar_pasta(self):
+        lotes = []
+        for nome in self._arquivos():
+            if nome in self.processados:
+                continue
+            self.processados.add(nome)
+            try:
+                lotes.append(validar_lote(pd.read_csv(os.path.join(self.caminho, nome))))
+            except Exception as e:
+                self.rejeitados.append({'origem': nome, 'erro': str(e), 'em': time.time()})
+        return lotes
+
+    def _verificar_arquivo(self):
+        try:
+            info = os.stat(self.caminho)
+        except FileNotFoundError:
+            return []
+        tamanho, identidade = info.st_size, (info.st_dev, info.st_ino)
+        if self._identidade is None:
+            self._identidade = identidade
+        if identidade != self._identidade or tamanho < self._deslocamento:
+            # Arquivo truncado ou substituído. As linhas já lidas continuam
+            # somadas ao cubo e não há como saber quais delas o conteúdo atual
+            # repete, então ele não é relido: o evento fica registrado e só o
+            # que for acrescentado daqui em diante entra
+            self.rejeitados.append({
+                'origem': os.path.basename(self.caminho),
+                'erro': (f"Arquivo truncado ou substituído ({tamanho} bytes, {self._deslocamento} já lidos); "
+                         "conteúdo atual ignorado"),
+                'em': time.time(),
+            })
+            self._identidade = identidade
+            self._deslocamento = tamanho
+            if tamanho:
+                self._ler_cabecalho()
+            return []
+        if tamanho == self._deslocamento:
+            return []
+        with open(self.caminho, 'rb') as f:
+            if self._deslocamento == 0:
+                self._cabecalho = f.readline()
+                self._deslocamento = f.tell()
+            f.seek(self._deslocamento)
+            novo = f.read(tamanho - self._deslocamento)
+        # Só linhas completas; uma linha ainda sendo escrita fica para a próxima vez
+        fim = novo.rfind(b'\n')
+        if fim < 0:
+            return []
+        novo = novo[:fim + 1]
+        origem = f'{os.path.basename(self.caminho)}@{self._deslocamento}'
+        self._deslocamento += len(novo)
+        if not novo.strip():
+            return []
+        try:
+            return [validar_lote(pd.read_csv(io.BytesIO(self._cabecalho + novo)))]
+        except Exception as e:
+            self.rejeitados.append({'origem': origem, 'erro': str(e), 'em': time.time()})
+            return []
+
+
+class BaseAoVivo:
+    """Base do dashboard que cresce por acréscimos.
+
+    Só o cubo é mantido: cada lote vira um cubo pequeno que é somado ao
+    atual, e as linhas do lote são descartadas. O app lê sempre o atributo
+    cubo, trocado de uma vez ao fim de cada atualização.
+    """
+
+    def __init__(self, df, resolucao=None):
+        self.cubo = CuboAgregado.de_dataframe(df, resolucao)
+        self.linhas_ingeridas = 0
+        self.lotes_ingeridos = 0
+        self.ultima_ingestao = None
+        self.monitor = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._parar = threading.Event()
+
+    def acrescentar(self, lote):
+        lote = lote[[c for c in colunas_dashboard if c in lote.columns]]
+        if lote.empty:
+            return self.cubo
+        delta = CuboAgregado.de_dataframe(lote, self.cubo.resolucao)
+        with self._lock:
+            self.cubo = self.cubo.combinar(delta)
+            self.linhas_ingeridas += len(lote)
+            self.lotes_ingeridos += 1
+            self.ultima_ingestao = time.time()
+        return self.cubo
+
+    def atualizar(self):
+        if self.monitor is None:
+            return 0
+        linhas = 0
+        for lote in self.monitor.verificar():
+            self.acrescentar(lote)
+            linhas += len(lote)
+        return linhas
+
+    def acompanhar(self, caminho, intervalo=2.0):
+        # Verifica a origem periodicamente numa thread do processo (idempotente)
+        if self._thread is not None:
+            return
+        self.monitor = MonitorIngestao(caminho)
+        self.atualizar()
+
+        def ciclo():
+            while not self._parar.wait(intervalo):
+                try:
+                    self.atualizar()
+                except Exception as e:
+                    self.monitor.rejeitados.append({'origem': caminho, 'erro': str(e), 'em': time.time()})
+
+        self._parar.clear()
+        self._thread = threading.Thread(target=ciclo, name='ingestao', daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        if self._thread is not None:
+            self._parar.set()
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,202 @@
+"""Pontuação em lote de arquivos grandes no esquema do Obesity.csv.
+
+Uso:
+    python -m obesidade.lote pacientes.csv resultado.parquet --tamanho-bloco 100000 --processos 4
+
+A entrada é lida em blocos de tamanho fixo e cada bloco é traduzido,
+pontuado e gravado antes de o próximo ser lido, então a memória fica
+constante independente do tamanho do arquivo.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+
+import pandas as pd
+
+from obesidade.drift import monitor_do_modelo
+from obesidade.nucleo import cols_modelo, cols_numericas, traducao_resultado, traduzir_entrada
+from obesidade.registro import registro_modelos
+
+MODELO_PADRAO = 'models/modelo_obesidade.pkl'
+
+_caminho_modelo = None
+
+
+def _formato(caminho, formato=None):
+    if formato:
+        return formato
+    return 'parquet' if caminho.lower().endswith(('.parquet', '.pq')) else 'csv'
+
+
+def ler_blocos(caminho, tamanho_bloco, formato=None):
+    # Colunas numéricas sempre como float64 para o esquema da saída
+    # não variar de um bloco para outro
+    if _formato(caminho, formato) == 'parquet':
+        import pyarrow.parquet as pq
+        arquivo = pq.ParquetFile(caminho)
+        for lote in arquivo.iter_batches(batch_size=tamanho_bloco):
+            bloco = lote.to_pandas()
+            cols = [c for c in cols_numericas if c in bloco.columns]
+            bloco[cols] = bloco[cols].astype('float64')
+            yield bloco
+    else:
+        tipos = {c: 'float64' for c in cols_numericas}
+        yield from pd.read_csv(caminho, chunksize=tamanho_bloco, dtype=tipos)
+
+
+class EscritorIncremental:
+    def __init__(self, caminho, formato=None):
+        self.caminho = caminho
+        self.formato = _formato(caminho, formato)
+        self._escritor = None
+        self._esquema = None
+        self._primeiro = True
+
+    def escrever(self, bloco):
+        if self.formato == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._escritor is None:
+                tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+                self._esquema = tabela.schema
+                self._escritor = pq.ParquetWriter(self.caminho, self._esquema)
+            else:
+                tabela = pa.Table.from_pandas(bloco, schema=self._esquema, preserve_index=False)
+            self._escritor.write_table(tabela)
+        else:
+            bloco.to_csv(self.caminho, mode='w' if self._primeiro else 'a',
+                         header=self._primeiro, index=False)
+        self._primeiro = False
+
+    def fechar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def pontuar_bloco(bloco, pipeline, probabilidades=True):
+    faltando = [c for c in cols_modelo if c not in bloco.columns]
+    if faltando:
+        raise ValueError(f"Colunas ausentes na entrada: {faltando}")
+
+    X = traduzir_entrada(bloco[cols_modelo])
+    saida = bloco.copy()
+    if probabilidades:
+        # Uma única passada na floresta: a classe prevista sai do argmax
+        proba = pipeline.predict_proba(X)
+        classes = pipeline.classes_
+        saida['Obesity_previsto'] = classes[proba.argmax(axis=1)]
+        for i, classe in enumerate(classes):
+            saida[f'prob_{classe}'] = proba[:, i]
+    else:
+        saida['Obesity_previsto'] = pipeline.predict(X)
+    saida['Obesity_PT_previsto'] = saida['Obesity_previsto'].map(traducao_resultado)
+    return saida
+
+
+def _iniciar_trabalhador(caminho_modelo):
+    global _caminho_modelo
+    _caminho_modelo = caminho_modelo
+    registro_modelos.obter(caminho_modelo)
+
+
+def _pontuar_no_trabalhador(bloco, probabilidades):
+    pipeline = registro_modelos.obter(_caminho_modelo).modelo
+    return pontuar_bloco(bloco, pipeline, probabilidades)
+
+
+def _pontuar_paralelo(blocos, caminho_modelo, processos, probabilidades):
+    # Janela limitada de blocos em voo: Executor.map consumiria o iterador
+    # inteiro de uma vez e a memória cresceria com o arquivo
+    with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_trabalhador,
+                             initargs=(caminho_modelo,)) as pool:
+        pendentes = deque()
+        for bloco in blocos:
+            pendentes.append(pool.submit(_pontuar_no_trabalhador, bloco, probabilidades))
+            if len(pendentes) >= 2 * processos:
+                yield pendentes.popleft().result()
+        while pendentes:
+            yield pendentes.popleft().result()
+
+
+def pontuar_arquivo(entrada, saida, caminho_modelo=MODELO_PADRAO, tamanho_bloco=50_000,
+                    processos=1, probabilidades=True, formato_entrada=None,
+                    formato_saida=None, progresso=True):
+    # Com linha de base (<modelo>.drift.json), os blocos pontuados também
+    # alimentam o monitor de deriva do modelo, já com a classe prevista
+    monitor = monitor_do_modelo(caminho_modelo)
+    blocos = ler_blocos(entrada, tamanho_bloco, formato_entrada)
+    if processos > 1:
+        resultados = _pontuar_paralelo(blocos, caminho_modelo, processos, probabilidades)
+    else:
+        pipeline = registro_modelos.obter(caminho_modelo).modelo
+        resultados = (pontuar_bloco(b, pipeline, probabilidades) for b in blocos)
+
+    total = 0
+    inicio = time.perf_counter()
+    with EscritorIncremental(saida, formato_saida) as escritor:
+        for resultado in resultados:
+            escritor.escrever(resultado)
+            if monitor is not None:
+                monitor.observar(resultado, resultado['Obesity_previsto'])
+            total += len(resultado)
+            if progresso:
+                decorrido = time.perf_counter() - inicio
+                print(f"{total:,} linhas | {total / decorrido:,.0f} linhas/s", file=sys.stderr)
+
+    decorrido = time.perf_counter() - inicio
+    return {
+        'linhas': total,
+        'segundos': decorrido,
+        'linhas_por_segundo': total / decorrido if decorrido > 0 else 0.0,
+        'drift': monitor.relatorio() if monitor is not None and total else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pontua pacientes em lote com o modelo de obesidade.")
+    parser.add_argument('entrada', help="CSV ou Parquet no esquema do Obesity.csv")
+    parser.add_argument('saida', help="Arquivo de saída (.csv ou .parquet)")
+    parser.add_argument('--modelo', default=MODELO_PADRAO, help="Caminho do pipeline .pkl")
+    parser.add_argument('--tamanho-bloco', type=int, default=50_000, help="Linhas por bloco")
+    parser.add_argument('--processos', type=int, default=1,
+                        help="Processos trabalhadores (0 = todos os núcleos)")
+    parser.add_argument('--sem-probabilidades', action='store_true',
+                        help="Grava apenas a classe prevista (usa predict em vez de predict_proba)")
+    parser.add_argument('--formato-entrada', choices=['csv', 'parquet'])
+    parser.add_argument('--formato-saida', choices=['csv', 'parquet'])
+    parser.add_argument('--silencioso', action='store_true', help="Não imprime o progresso por bloco")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.modelo):
+        parser.error(f"Modelo não encontrado: '{args.modelo}'")
+    processos = args.processos if args.processos > 0 else (os.cpu_count() or 1)
+
+    resumo = pontuar_arquivo(
+        args.entrada, args.saida,
+        caminho_modelo=args.modelo,
+        tamanho_bloco=args.tamanho_bloco,
+        processos=processos,
+        probabilidades=not args.sem_probabilidades,
+        formato_entrada=args.formato_entrada,
+        formato_saida=args.formato_saida,
+        progresso=not args.silencioso,
+    )
+    print(f"Concluído: {resumo['linhas']:,} linhas em {resumo['segundos']:.2f}s "
+          f"({resumo['linhas_por_segundo']:,.0f} linhas/s) -> '{args.saida}'")
+    if resumo['drift'] is not None:
+        maiores = [v for v in resumo['drift']['variaveis'] if v['nivel'] != 'estavel']
+        print("Deriva em relação ao treino (PSI): " + (
+            ', '.join(f"{v['variavel']} {v['psi']:.2f} ({v['nivel']})" for v in maiores) or "estável"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""Instrumentação das etapas do app: spans com histogramas em memória.
+
+Cada span registra sua duração num histograma de faixas fixas (as mesmas
+do Prometheus), identificado pelo nome e pelos rótulos. Registrar uma
+observação custa uma busca binária e um incremento sob lock, sem guardar
+as amostras individuais; por isso os spans podem ficar ligados em produção.
+
+    with metricas.span('grafico', grafico='idade'):
+        ...
+
+Módulos com contadores próprios (como os caches de figuras e de previsões)
+se registram com registrar_fonte, e seus valores saem junto com os spans.
+
+Os dados saem em texto no formato do Prometheus (exportar_prometheus, ou
+servir_metricas para um endpoint /metrics) ou em JSON (exportar_json).
+PerfilAmostral é um profiler por amostragem de pilhas, ligado a uma única
+thread (a da sessão do Streamlit que o pediu).
+"""
+import bisect
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Limites das faixas em segundos (0,5 ms a 30 s)
+faixas_padrao = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histograma:
+    __slots__ = ('faixas', 'contagens', 'soma', 'total', 'maximo')
+
+    def __init__(self, faixas=faixas_padrao):
+        self.faixas = faixas
+        self.contagens = [0] * (len(faixas) + 1)  # última faixa: +Inf
+        self.soma = 0.0
+        self.total = 0
+        self.maximo = 0.0
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(self.faixas, valor)] += 1
+        self.soma += valor
+        self.total += 1
+        if valor > self.maximo:
+            self.maximo = valor
+
+    def quantil(self, q):
+        # Interpolação linear dentro da faixa (mesma estimativa do histogram_quantile)
+        if not self.total:
+            return 0.0
+        alvo = q * self.total
+        acumulado = 0
+        for i, n in enumerate(self.contagens):
+            if acumulado + n >= alvo and n:
+                inferior = self.faixas[i - 1] if i > 0 else 0.0
+                superior = self.faixas[i] if i < len(self.faixas) else self.maximo
+                return min(inferior + (superior - inferior) * (alvo - acumulado) / n, self.maximo)
+            acumulado += n
+        return self.maximo
+
+
+def _escapar_rotulo(valor):
+    # Escapes exigidos pelo formato de texto do Prometheus em valores de rótulo
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos_prometheus(rotulos):
+    return ','.join(f'{k}="{_escapar_rotulo(v)}"' for k, v in rotulos)
+
+
+class Metricas:
+    def __init__(self, faixas=faixas_padrao):
+        self.faixas = faixas
+        self._series = {}
+        self._fontes = {}
+        self._lock = threading.Lock()
+
+    def observar(self, nome, segundos, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = Histograma(self.faixas)
+            serie.observar(segundos)
+
+    @contextmanager
+    def span(self, nome, **rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nome, time.perf_counter() - inicio, **rotulos)
+
+    def registrar_fonte(self, nome, estatisticas):
+        # estatisticas(): dicionário {nome: número}, lido a cada exportação
+        with self._lock:
+            self._fontes[nome] = estatisticas
+
+    def estatisticas(self):
+        with self._lock:
+            fontes = sorted(self._fontes.items())
+        return {nome: estatisticas() for nome, estatisticas in fontes}
+
+    def resumo(self):
+        with self._lock:
+            series = sorted(self._series.items())
+            return [{
+                'span': nome,
+                'rotulos': dict(rotulos),
+                'contagem': h.total,
+                'soma_s': h.soma,
+                'media_ms': h.soma / h.total * 1000 if h.total else 0.0,
+                'p50_ms': h.quantil(0.50) * 1000,
+                'p95_ms': h.quantil(0.95) * 1000,
+                'p99_ms': h.quantil(0.99) * 1000,
+                'max_ms': h.maximo * 1000,
+                'faixas': {str(f): n for f, n in zip(list(h.faixas) + ['+Inf'], h.contagens)},
+            } for (nome, rotulos), h in series]
+
+    def exportar_json(self):
+        return json.dumps({'spans': self.resumo(), 'fontes': self.estatisticas()},
+                          indent=2, ensure_ascii=False)
+
+    def exportar_prometheus(self, prefixo='obesidade'):
+        familia = f'{prefixo}_span_segundos'
+        linhas = [f'# HELP {familia} Duração das etapas instrumentadas do app.',
+                  f'# TYPE {familia} histogram']
+        with self._lock:
+            for (nome, rotulos), h in sorted(self._series.items()):
+                base = _rotulos_prometheus((('span', nome),) + rotulos)
+                acumulado = 0
+                for limite, n in zip(list(h.faixas) + ['+Inf'], h.contagens):
+                    acumulado += n
+                    linhas.append(f'{familia}_bucket{{{base},le="{limite}"}} {acumulado}')
+                linhas.append(f'{familia}_sum{{{base}}} {h.soma!r}')
+                linhas.append(f'{familia}_count{{{base}}} {h.total}')
+        # Fontes registradas: um gauge por valor (ex.: obesidade_cache_figuras_acertos)
+        for fonte, valores in self.estatisticas().items():
+            for chave, valor in valores.items():
+                nome = f'{prefixo}_{fonte}_{chave}'
+                linhas.append(f'# TYPE {nome} gauge')
+                linhas.append(f'{nome} {float(valor)!r}')
+        return '\n'.join(linhas) + '\n'
+
+    def limpar(self):
+        with self._lock:
+            self._series.clear()
+
+
+class PerfilAmostral:
+    """Amostra a pilha de uma thread em intervalos fixos (pilhas agregadas).
+
+    Só a thread alvo é observada, então o custo recai sobre uma única sessão.
+    O resultado pode ser lido como as funções mais frequentes (resumo) ou em
+    "collapsed stacks" (pilhas_agregadas), o formato aceito pelo flamegraph.pl
+    e pelo speedscope.
+    """
+
+    def __init__(self, intervalo=0.005):
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self.amostras = 0
+        self._alvo = None
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self, thread_id=None):
+        # Chamado de novo a cada rerun: o Streamlit pode trocar a thread do script
+        self._alvo = thread_id if thread_id is not None else threading.get_ident()
+        if self._thread is not None:
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._amostrar, name='perfil-amostral', daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        if self._thread is None:
+            return
+        self._parar.set()
+        self._thread.join()
+        self._thread = None
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self._alvo)
+            if frame is None:
+                continue
+            pilha = []
+            while frame is not None:
+                codigo = frame.f_code
+                pilha.append(f'{codigo.co_name} ({codigo.co_filename}:{codigo.co_firstlineno})')
+                frame = frame.f_back
+            self.pilhas[';'.join(reversed(pilha))] += 1
+            self.amostras += 1
+
+    def pilhas_agregadas(self):
+        return '\n'.join(f'{pilha} {n}' for pilha, n in self.pilhas.most_common()) + '\n'
+
+    def resumo(self, limite=15):
+        # "proprio": amostras com a função no topo da pilha; "inclusivo": em qualquer nível
+        proprio, inclusivo = Counter(), Counter()
+        for pilha, n in self.pilhas.items():
+            funcoes = pilha.split(';')
+            proprio[funcoes[-1]] += n
+            for funcao in set(funcoes):
+                inclusivo[funcao] += n
+        total = self.amostras or 1
+        return [{'funcao': f, 'proprio': n / total, 'inclusivo': inclusivo[f] / total}
+                for f, n in proprio.most_common(limite)]
+
+
+_servidor = None
+
+
+def servir_metricas(porta, endereco='127.0.0.1', registro=None):
+    # Endpoint /metrics para o Prometheus, numa thread do próprio processo.
+    # Idempotente: o Streamlit reexecuta o app, mas só um servidor é criado.
+    # Só local por padrão: os spans expõem nomes de páginas e de gráficos;
+    # use endereco='0.0.0.0' para um Prometheus em outra máquina
+    global _servidor
+    if _servidor is not None:
+        return _servidor
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    registro = registro or metricas
+
+    class Tratador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith('/metrics.json'):
+                corpo, tipo = registro.exportar_json().encode('utf-8'), 'application/json'
+            elif self.path.startswith('/metrics'):
+                corpo, tipo = registro.exportar_prometheus().encode('utf-8'), 'text/plain; version=0.0.4'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', tipo)
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    _servidor = ThreadingHTTPServer((endereco, porta), Tratador)
+    threading.Thread(target=_servidor.serve_forever, name='metricas-http', daemon=True).start()
+    return _servidor
+
+
+# Instância única do processo, compartilhada entre as sessões do Streamlit
+metricas = Metricas()
@@ -0,0 +1,68 @@
+"""Definições de domínio usadas pelo app e pelo pipeline treinado."""
+
+
+# Colunas que arredondar_valores leva a inteiros (também usadas pelo
+# compilador da floresta e pelo cache de previsões)
+cols_arredondadas = ['FCVC', 'NCP', 'CH2O', 'FAF', 'TUE']
+
+
+# FUNÇÃO ESSENCIAL PARA O MODELO
+# O pipeline salvo referencia esta função dentro do FunctionTransformer,
+# por isso ela precisa existir em qualquer processo que carregue o .pkl
+def arredondar_valores(X_in):
+    try:
+        X_out = X_in.copy()
+        valid_cols = [c for c in cols_arredondadas if c in X_out.columns]
+        if valid_cols:
+            X_out[valid_cols] = X_out[valid_cols].round().astype(int)
+        return X_out
+    except Exception:
+        return X_in
+
+
+# Colunas consumidas pelo pipeline (mesma divisão usada no notebook de treino)
+cols_numericas = ['Age', 'Height', 'Weight', 'FCVC', 'NCP', 'CH2O', 'FAF', 'TUE']
+cols_ordinais = ['CAEC', 'CALC']
+cols_nominais = ['Gender', 'family_history', 'FAVC', 'SMOKE', 'SCC', 'MTRANS']
+cols_modelo = cols_numericas + cols_ordinais + cols_nominais
+
+traducao_resultado = {
+    'Insufficient_Weight': 'Abaixo do Peso',
+    'Normal_Weight': 'Peso Normal',
+    'Overweight_Level_I': 'Sobrepeso Nível I',
+    'Overweight_Level_II': 'Sobrepeso Nível II',
+    'Obesity_Type_I': 'Obesidade Grau I',
+    'Obesity_Type_II': 'Obesidade Grau II',
+    'Obesity_Type_III': 'Obesidade Mórbida'
+}
+
+ordem_obesidade = ['Abaixo do Peso', 'Peso Normal', 'Sobrepeso Nível I', 'Sobrepeso Nível II',
+                   'Obesidade Grau I', 'Obesidade Grau II', 'Obesidade Mórbida']
+
+mapa_sim_nao = {'Sim': 'yes', 'Não': 'no'}
+mapa_genero = {'Masculino': 'Male', 'Feminino': 'Female'}
+mapa_transporte = {'Transporte Público': 'Public_Transportation', 'Caminhada': 'Walking',
+                   'Carro': 'Automobile', 'Moto': 'Motorbike', 'Bicicleta': 'Bike'}
+mapa_frequencia = {'Não': 'no', 'Às vezes': 'Sometimes', 'Frequentemente': 'Frequently', 'Sempre': 'Always'}
+
+# Qual mapa traduz cada coluna categórica
+mapas_por_coluna = {
+    'Gender': mapa_genero,
+    'family_history': mapa_sim_nao,
+    'FAVC': mapa_sim_nao,
+    'SMOKE': mapa_sim_nao,
+    'SCC': mapa_sim_nao,
+    'CAEC': mapa_frequencia,
+    'CALC': mapa_frequencia,
+    'MTRANS': mapa_transporte,
+}
+
+
+def traduzir_entrada(df):
+    # Converte rótulos em português (como os do formulário) para os valores
+    # do Obesity.csv. Valores que já estão no formato original passam direto.
+    df = df.copy()
+    for col, mapa in mapas_por_coluna.items():
+        if col in df.columns and df[col].dtype == object:
+            df[col] = df[col].replace(mapa)
+    return df
@@ -0,0 +1,150 @@
+"""Registro de modelos compartilhado por todas as sessões do processo.
+
+O Streamlit reexecuta o app.py a cada interação, mas módulos importados
+permanecem em memória. Guardando o pipeline aqui, cada versão do .pkl é
+desserializada uma única vez por processo e recarregada apenas quando o
+arquivo em disco muda de conteúdo.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+
+from obesidade.nucleo import arredondar_valores
+
+
+@dataclass(frozen=True)
+class VersaoModelo:
+    caminho: str
+    modelo: object
+    sha256: str
+    mtime: float
+    tamanho: int
+    tempo_carga: float
+    carregado_em: float
+
+
+def hash_arquivo(caminho, bloco=1 << 20):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for parte in iter(lambda: f.read(bloco), b''):
+            h.update(parte)
+    return h.hexdigest()
+
+
+# O modelo foi serializado a partir do notebook, então o pickle procura estas
+# funções em __main__ (que muda conforme o ponto de entrada)
+funcoes_pickle = {'arredondar_valores': arredondar_valores}
+
+
+def desserializar(caminho):
+    # joblib.load com um find_class que resolve __main__.<função> pelo
+    # módulo do pacote, sem depender nem alterar o __main__ do processo
+    from joblib.numpy_pickle import NumpyUnpickler
+    from joblib.numpy_pickle_utils import _validate_fileobject_and_memmap
+
+    class Desserializador(NumpyUnpickler):
+        def find_class(self, modulo, nome):
+            if modulo == '__main__' and nome in funcoes_pickle:
+                return funcoes_pickle[nome]
+            return super().find_class(modulo, nome)
+
+    with open(caminho, 'rb') as f:
+        with _validate_fileobject_and_memmap(f, caminho, None) as (fobj, _):
+            return Desserializador(caminho, fobj, ensure_native_byte_order=True).load()
+
+
+class RegistroModelos:
+    def __init__(self, max_historico=100):
+        self._versoes = {}
+        # Impressão digital (mtime, tamanho) e erro da última carga que falhou
+        # em cada caminho: o mesmo arquivo quebrado não é relido a cada chamada
+        self._falhas = {}
+        self._lock = threading.Lock()
+        self.historico = deque(maxlen=max_historico)
+        self.ultimo_erro = None
+
+    def _conhecida(self, chave, atual, digital):
+        # Versão a devolver sem tocar no arquivo; None se for preciso (re)carregar
+        if atual is not None and (atual.mtime, atual.tamanho) == digital:
+            return atual
+        falha = self._falhas.get(chave)
+        if falha is not None and falha[0] == digital:
+            if atual is None:
+                raise falha[1]
+            return atual
+        return None
+
+    def obter(self, caminho):
+        chave = os.path.abspath(caminho)
+        info = os.stat(chave)
+        # Caminho rápido: um stat por chamada, sem lock
+        conhecida = self._conhecida(chave, self._versoes.get(chave), (info.st_mtime, info.st_size))
+        if conhecida is not None:
+            return conhecida
+
+        with self._lock:
+            atual = self._versoes.get(chave)
+            info = os.stat(chave)
+            digital = (info.st_mtime, info.st_size)
+            conhecida = self._conhecida(chave, atual, digital)
+            if conhecida is not None:
+                return conhecida
+
+            sha = hash_arquivo(chave)
+            if atual is not None and atual.sha256 == sha:
+                # Arquivo "tocado" sem mudar o conteúdo: só atualiza os metadados
+                atual = replace(atual, mtime=info.st_mtime, tamanho=info.st_size)
+                self._versoes[chave] = atual
+                self._falhas.pop(chave, None)
+                return atual
+
+            try:
+                nova = self._carregar(chave, sha, info)
+            except Exception as e:
+                self.ultimo_erro = e
+                # Só tenta de novo quando o arquivo mudar (mtime ou tamanho)
+                self._falhas[chave] = (digital, e)
+                # Durante um hot-reload (ex.: arquivo ainda sendo copiado),
+                # continua servindo a versão anterior
+                if atual is not None:
+                    return atual
+                raise
+            self._versoes[chave] = nova
+            self._falhas.pop(chave, None)
+            self.historico.append({
+                'caminho': chave,
+                'sha256': sha,
+                'tempo_carga': nova.tempo_carga,
+                'carregado_em': nova.carregado_em,
+            })
+            return nova
+
+    def _carregar(self, caminho, sha, info):
+        # joblib (e, pelo pickle, o scikit-learn) só é importado na primeira carga
+        inicio = time.perf_counter()
+        modelo = desserializar(caminho)
+        tempo = time.perf_counter() - inicio
+        return VersaoModelo(
+            caminho=caminho,
+            modelo=modelo,
+            sha256=sha,
+            mtime=info.st_mtime,
+            tamanho=info.st_size,
+            tempo_carga=tempo,
+            carregado_em=time.time(),
+        )
+
+    def versoes(self):
+        return dict(self._versoes)
+
+    def limpar(self):
+        with self._lock:
+            self._versoes.clear()
+            self._falhas.clear()
+
+
+# Instância única do processo (módulos não são reexecutados pelo Streamlit)
+registro_modelos = RegistroModelos()
@@ -0,0 +1,127 @@
+"""Renderização dos gráficos do dashboard em paralelo, em processos.
+
+O pyplot não é seguro entre threads, então cada gráfico é desenhado num
+processo do pool (backend Agg, uma figura por vez por processo). Cada
+processo aplica o mesmo tema global do app (aplicar_tema) ao iniciar, de
+modo que as imagens saem iguais às renderizadas no próprio script. Cada
+processo recebe só a projeção do cubo filtrado que o seu gráfico consulta
+(graficos.agregados_graficos), calcula os agregados do gráfico e devolve os
+bytes da imagem.
+
+Com N núcleos, a latência da página tende à do gráfico mais lento em vez
+da soma dos nove.
+
+Os processos saem de um servidor forkserver que pré-carrega
+obesidade.servidor_render (ver lá por que o app.py não é reexecutado neles).
+Onde não há forkserver (Windows), o modo paralelo fica desligado.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+_pool = None
+_processos_pool = 0
+_lock = threading.Lock()
+
+
+# Abaixo disso o pool só é usado se OBESIDADE_PROCESSOS_RENDER pedir
+nucleos_minimos = 4
+
+
+def processos_padrao():
+    # OBESIDADE_PROCESSOS_RENDER=0 desliga o modo paralelo. Sem a variável,
+    # um processo por núcleo até o número de gráficos do dashboard (mais
+    # que isso ficaria ocioso)
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return 0
+    valor = os.environ.get('OBESIDADE_PROCESSOS_RENDER')
+    if valor is not None:
+        return int(valor)
+    nucleos = os.cpu_count() or 1
+    if nucleos < nucleos_minimos:
+        return 0
+    from obesidade.graficos import graficos_dashboard
+    return min(nucleos, len(graficos_dashboard))
+
+
+def _iniciar_processo():
+    import matplotlib
+    matplotlib.use('Agg')
+    from obesidade.graficos import aplicar_tema
+    aplicar_tema()
+
+
+def _renderizar(nome, cubo):
+    from obesidade.graficos import graficos_dashboard, renderizar
+    return renderizar(graficos_dashboard[nome](cubo))
+
+
+def obter_pool(processos=None):
+    # Um pool por processo do servidor, criado na primeira vez e reaproveitado
+    # entre reruns e sessões
+    global _pool, _processos_pool
+    processos = processos or processos_padrao()
+    with _lock:
+        if _pool is None or _processos_pool != processos:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # forkserver: o pool pode nascer na thread de aquecimento de um
+            # servidor com várias threads, e um fork desse processo pode
+            # herdar locks presos. Os processos saem de um servidor limpo que
+            # já importou os gráficos e não reexecuta o __main__
+            contexto = multiprocessing.get_context('forkserver')
+            contexto.set_forkserver_preload(['obesidade.servidor_render'])
+            _pool = ProcessPoolExecutor(max_workers=processos, mp_context=contexto,
+                                        initializer=_iniciar_processo)
+            _processos_pool = processos
+        return _pool
+
+
+def _nada():
+    return None
+
+
+def aquecer_pool(processos=None):
+    # Sobe os processos sem bloquear, para que a primeira página do
+    # dashboard não pague esse custo
+    processos = processos or processos_padrao()
+    pool = obter_pool(processos)
+    for _ in range(processos):
+        pool.submit(_nada)
+
+
+def encerrar_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def renderizar_graficos(cubo, nomes, processos=None):
+    # {nome: bytes} dos gráficos desenhados no pool. Um gráfico que falha no
+    # processo fica de fora, para o chamador desenhá-lo em série (onde o erro
+    # aparece como no modo sequencial); só um pool quebrado levanta exceção
+    from obesidade.graficos import agregados_graficos
+    nomes = list(nomes)
+    if not nomes:
+        return {}
+    pool = obter_pool(processos)
+    try:
+        futuros = {nome: pool.submit(_renderizar, nome, cubo.projetar(*agregados_graficos[nome]))
+                   for nome in nomes}
+        imagens = {}
+        for nome, futuro in futuros.items():
+            try:
+                imagens[nome] = futuro.result()
+            except BrokenProcessPool:
+                raise
+            except Exception:
+                pass
+        return imagens
+    except BrokenProcessPool:
+        # Um processo morreu: descarta o pool para recriar na próxima vez
+        encerrar_pool()
+        raise
@@ -0,0 +1,72 @@
+"""Análise de sensibilidade (what-if) do Simulador de Risco.
+
+A partir do paciente enviado, monta de uma vez a grade de perfis em que
+só uma variável de estilo de vida muda (as demais ficam como no envio) e
+pontua a grade inteira com uma única chamada de predict_proba. O
+resultado são as curvas de probabilidade de cada classe ao longo de cada
+variável e os pontos em que a classe prevista muda.
+"""
+import numpy as np
+import pandas as pd
+
+from obesidade.nucleo import cols_modelo
+
+# Variável -> (mínimo, máximo), nos mesmos limites dos campos do formulário
+faixas_sensibilidade = {
+    'FAF': (0.0, 3.0),
+    'CH2O': (1.0, 3.0),
+    'FCVC': (1.0, 3.0),
+    'TUE': (0.0, 2.0),
+    'Weight': (30.0, 200.0),
+}
+
+# Peso varia em torno do valor informado (±kg), não na faixa inteira
+variacao_peso = 30.0
+
+
+def _valores(variavel, atual, pontos):
+    minimo, maximo = faixas_sensibilidade[variavel]
+    if variavel == 'Weight':
+        minimo, maximo = max(minimo, atual - variacao_peso), min(maximo, atual + variacao_peso)
+    # Inclui o valor atual para a curva passar exatamente pelo paciente
+    return np.unique(np.append(np.linspace(minimo, maximo, pontos), float(atual)))
+
+
+def montar_grade(registro, variaveis=None, pontos=41):
+    variaveis = list(variaveis or faixas_sensibilidade)
+    blocos = [(v, _valores(v, registro[v], pontos)) for v in variaveis]
+    n = sum(len(valores) for _, valores in blocos)
+
+    # Repete a linha do paciente (mantendo os tipos) e troca uma variável por bloco
+    base = pd.DataFrame([registro], columns=cols_modelo)
+    grade = base.iloc[np.zeros(n, dtype=np.intp)].reset_index(drop=True)
+    variavel = np.repeat([v for v, _ in blocos], [len(valores) for _, valores in blocos])
+    valor = np.concatenate([valores for _, valores in blocos])
+    for v, _ in blocos:
+        grade[v] = np.where(variavel == v, valor, grade[v].astype(float))
+    return grade, variavel, valor
+
+
+def varrer(modelo, registro, variaveis=None, pontos=41):
+    # Uma única chamada de predict_proba para a grade inteira
+    grade, variavel, valor = montar_grade(registro, variaveis, pontos)
+    proba = modelo.predict_proba(grade)
+    classes = [str(c) for c in modelo.classes_]
+
+    curvas = {}
+    for v in dict.fromkeys(variavel):
+        sel = variavel == v
+        curvas[v] = pd.DataFrame(proba[sel], index=pd.Index(valor[sel], name=v), columns=classes)
+    return curvas
+
+
+def mudancas_de_classe(curvas):
+    # (variável, valor anterior, valor, classe anterior, nova classe) a cada troca de classe prevista
+    trocas = []
+    for v, curva in curvas.items():
+        prevista = curva.idxmax(axis=1)
+        muda = prevista.ne(prevista.shift()) & prevista.shift().notna()
+        for posicao in np.flatnonzero(muda.to_numpy()):
+            trocas.append((v, curva.index[posicao - 1], curva.index[posicao],
+                           prevista.iloc[posicao - 1], prevista.iloc[posicao]))
+    return trocas
@@ -0,0 +1,354 @@
+"""Serviço HTTP de pontuação (JSON) com micro-lotes.
+
+Uso:
+    python -m obesidade.servico --porta 8000 --max-lote 64 --max-espera-ms 5
+
+Requisições concorrentes de um único paciente são agrupadas em
+micro-lotes e cada lote passa por uma única chamada vetorizada de
+predict_proba, diluindo o custo fixo de cada chamada à floresta.
+
+Endpoints:
+    POST /prever  corpo: {"Age": 30, "Gender": "Masculino", ...} (rótulos do formulário ou do Obesity.csv)
+    GET  /saude   estado do serviço e estatísticas dos lotes
+    GET  /drift   deriva das entradas e das previsões em relação à linha de base do treino
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import time
+
+import pandas as pd
+
+from obesidade.drift import monitor_do_modelo
+from obesidade.nucleo import (cols_modelo, cols_numericas, mapas_por_coluna, traducao_resultado,
+                              traduzir_entrada)
+from obesidade.registro import registro_modelos
+
+log = logging.getLogger(__name__)
+
+MODELO_PADRAO = 'models/modelo_obesidade.pkl'
+
+_STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+_MAX_CORPO = 64 * 1024
+
+
+class ErroEntrada(ValueError):
+    pass
+
+
+# Valores aceitos em cada coluna categórica: rótulos do formulário ou do Obesity.csv
+vocabulario = {c: set(mapa) | set(mapa.values()) for c, mapa in mapas_por_coluna.items()}
+
+
+def validar_paciente(dados):
+    if not isinstance(dados, dict):
+        raise ErroEntrada("O corpo deve ser um objeto JSON com os dados de um paciente.")
+    faltando = [c for c in cols_modelo if c not in dados]
+    if faltando:
+        raise ErroEntrada(f"Campos ausentes: {faltando}")
+    registro = {c: dados[c] for c in cols_modelo}
+    for c in cols_numericas:
+        try:
+            registro[c] = float(registro[c])
+        except (TypeError, ValueError):
+            raise ErroEntrada(f"Campo numérico inválido: '{c}'")
+        # float() aceita "nan" e "inf", que a floresta pontuaria sem reclamar
+        if not math.isfinite(registro[c]):
+            raise ErroEntrada(f"Campo numérico não finito: '{c}'")
+    # O pipeline ignora categorias desconhecidas (handle_unknown='ignore'),
+    # então um valor fora do vocabulário seria pontuado em silêncio
+    for c, aceitos in vocabulario.items():
+        if not isinstance(registro[c], str) or registro[c] not in aceitos:
+            raise ErroEntrada(f"Valor inválido em '{c}': {registro[c]!r}. "
+                              f"Aceitos: {sorted(aceitos)}")
+    return registro
+
+
+class AgrupadorPredicoes:
+    def __init__(self, obter_pipeline, max_lote=64, max_espera_ms=5.0, obter_monitor=None):
+        self.obter_pipeline = obter_pipeline
+        self.obter_monitor = obter_monitor
+        self.max_lote = max_lote
+        self.max_espera = max_espera_ms / 1000.0
+        self._fila = None
+        self._tarefa = None
+        # Lote já retirado da fila (em coleta ou sendo pontuado)
+        self._lote = []
+        self.lotes = 0
+        self.pacientes = 0
+        self.maior_lote = 0
+
+    async def iniciar(self):
+        self._fila = asyncio.Queue()
+        self._tarefa = asyncio.get_running_loop().create_task(self._laco())
+
+    async def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+        # Quem ainda espera resposta (lote interrompido e o que restou na fila)
+        # recebe erro em vez de ficar pendurado
+        pendentes, self._lote = self._lote, []
+        while self._fila is not None and not self._fila.empty():
+            pendentes.append(self._fila.get_nowait())
+        for _, futuro in pendentes:
+            if not futuro.done():
+                futuro.set_exception(RuntimeError("Serviço de predição encerrado."))
+
+    async def prever(self, registro):
+        if self._tarefa is None:
+            raise RuntimeError("Serviço de predição encerrado.")
+        futuro = asyncio.get_running_loop().create_future()
+        await self._fila.put((registro, futuro))
+        return await futuro
+
+    async def _coletar_lote(self):
+        self._lote = lote = [await self._fila.get()]
+        limite = time.monotonic() + self.max_espera
+        while len(lote) < self.max_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(await asyncio.wait_for(self._fila.get(), restante))
+            except asyncio.TimeoutError:
+                break
+        return lote
+
+    async def _laco(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = await self._coletar_lote()
+            registros = [r for r, _ in lote]
+            try:
+                # A floresta roda fora do event loop para não travar a recepção
+                resultados = await loop.run_in_executor(None, self._pontuar, registros)
+            except Exception:
+                # Uma linha ruim não derruba o lote inteiro: pontua uma a uma
+                # e só a requisição que causou o erro recebe a exceção
+                resultados = await loop.run_in_executor(None, self._pontuar_um_a_um, registros)
+            respondidos = []
+            for (registro, futuro), resultado in zip(lote, resultados):
+                if isinstance(resultado, Exception):
+                    if not futuro.done():
+                        futuro.set_exception(resultado)
+                    continue
+                if not futuro.done():
+                    futuro.set_result(resultado)
+                respondidos.append((registro, resultado))
+            if self.obter_monitor is not None and respondidos:
+                # Depois de responder, fora do event loop: não entra na latência
+                drift = loop.run_in_executor(None, self._observar_drift,
+                                             [r for r, _ in respondidos], [r for _, r in respondidos])
+                drift.add_done_callback(self._drift_concluido)
+            self._lote = []
+            self.lotes += 1
+            self.pacientes += len(lote)
+            self.maior_lote = max(self.maior_lote, len(lote))
+
+    def _pontuar(self, registros):
+        pipeline = self.obter_pipeline()
+        X = traduzir_entrada(pd.DataFrame.from_records(registros, columns=cols_modelo))
+        proba = pipeline.predict_proba(X)
+        classes = [str(c) for c in pipeline.classes_]
+        resultados = []
+        for linha in proba:
+            classe = classes[int(linha.argmax())]
+            resultados.append({
+                'classe': classe,
+                'classe_pt': traducao_resultado.get(classe, classe),
+                'probabilidades': {c: float(p) for c, p in zip(classes, linha)},
+            })
+        return resultados
+
+    def _pontuar_um_a_um(self, registros):
+        # Mesma ordem de registros; a posição de quem falhou guarda a exceção
+        resultados = []
+        for registro in registros:
+            try:
+                resultados.extend(self._pontuar([registro]))
+            except Exception as e:
+                resultados.append(e)
+        return resultados
+
+    def _observar_drift(self, registros, resultados):
+        monitor = self.obter_monitor()
+        if monitor is not None:
+            for registro, resultado in zip(registros, resultados):
+                monitor.observar_registro(registro, resultado['classe'])
+
+    @staticmethod
+    def _drift_concluido(futuro):
+        # Ninguém espera pelo registro da deriva: uma falha só aparece no log
+        if not futuro.cancelled() and futuro.exception() is not None:
+            log.error("Falha ao registrar a deriva do lote", exc_info=futuro.exception())
+
+    def estatisticas(self):
+        return {
+            'lotes': self.lotes,
+            'pacientes': self.pacientes,
+            'media_por_lote': self.pacientes / self.lotes if self.lotes else 0.0,
+            'maior_lote': self.maior_lote,
+            'na_fila': self._fila.qsize() if self._fila is not None else 0,
+        }
+
+
+class ServicoPredicao:
+    def __init__(self, caminho_modelo=MODELO_PADRAO, max_lote=64, max_espera_ms=5.0):
+        self.caminho_modelo = caminho_modelo
+        self.agrupador = AgrupadorPredicoes(self._pipeline, max_lote, max_espera_ms, self._monitor_drift)
+
+    def _pipeline(self):
+        return registro_modelos.obter(self.caminho_modelo).modelo
+
+    def _monitor_drift(self):
+        return monitor_do_modelo(self.caminho_modelo)
+
+    async def iniciar(self):
+        # Carrega o modelo antes da primeira requisição
+        await asyncio.get_running_loop().run_in_executor(None, self._pipeline)
+        await self.agrupador.iniciar()
+
+    async def parar(self):
+        await self.agrupador.parar()
+
+    async def tratar(self, metodo, caminho, corpo):
+        # Devolve (status, dicionário de resposta); independente do transporte HTTP
+        caminho = caminho.split('?', 1)[0]
+        if caminho == '/saude':
+            if metodo != 'GET':
+                return 405, {'erro': "Use GET em /saude."}
+            versao = registro_modelos.obter(self.caminho_modelo)
+            return 200, {'status': 'ok', 'modelo_sha256': versao.sha256,
+                         'lotes': self.agrupador.estatisticas()}
+        if caminho == '/drift':
+            if metodo != 'GET':
+                return 405, {'erro': "Use GET em /drift."}
+            monitor = self._monitor_drift()
+            if monitor is None:
+                return 404, {'erro': "O modelo não tem linha de base de deriva (.drift.json)."}
+            return 200, monitor.relatorio()
+        if caminho == '/prever':
+            if metodo != 'POST':
+                return 405, {'erro': "Use POST em /prever."}
+            try:
+                registro = validar_paciente(json.loads(corpo or b'null'))
+            except json.JSONDecodeError:
+                return 400, {'erro': "JSON inválido."}
+            except ErroEntrada as e:
+                return 400, {'erro': str(e)}
+            try:
+                return 200, await self.agrupador.prever(registro)
+            except Exception as e:
+                return 500, {'erro': str(e)}
+        return 404, {'erro': f"Rota não encontrada: {caminho}"}
+
+    async def _conexao(self, leitor, escritor):
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                try:
+                    metodo, caminho, _ = linha.decode('latin-1').split(' ', 2)
+                except ValueError:
+                    await self._responder(escritor, 400, {'erro': "Requisição malformada."}, False)
+                    break
+                cabecalhos = {}
+                while True:
+                    h = await leitor.readline()
+                    if h in (b'\r\n', b'\n', b''):
+                        break
+                    nome, _, valor = h.decode('latin-1').partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                try:
+                    tamanho = int(cabecalhos.get('content-length', 0) or 0)
+                except ValueError:
+                    tamanho = -1
+                if tamanho < 0:
+                    await self._responder(escritor, 400, {'erro': "Content-Length inválido."}, False)
+                    break
+                if tamanho > _MAX_CORPO:
+                    await self._responder(escritor, 413, {'erro': "Corpo grande demais."}, False)
+                    break
+                corpo = await leitor.readexactly(tamanho) if tamanho else b''
+                manter = cabecalhos.get('connection', '').lower() != 'close'
+                status, resposta = await self.tratar(metodo.upper(), caminho, corpo)
+                await self._responder(escritor, status, resposta, manter)
+                if not manter:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            escritor.close()
+
+    async def _responder(self, escritor, status, resposta, manter):
+        corpo = json.dumps(resposta, ensure_ascii=False).encode('utf-8')
+        cabecalho = (f"HTTP/1.1 {status} {_STATUS.get(status, '')}\r\n"
+                     f"Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(corpo)}\r\n"
+                     f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n")
+        escritor.write(cabecalho.encode('latin-1') + corpo)
+        await escritor.drain()
+
+    async def servir(self, host='127.0.0.1', porta=8000):
+        await self.iniciar()
+        servidor = await asyncio.start_server(self._conexao, host, porta)
+        print(f"Servindo em http://{host}:{porta} (max_lote={self.agrupador.max_lote}, "
+              f"max_espera={self.agrupador.max_espera * 1000:.1f}ms)")
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            await self.parar()
+
+
+class ClienteLocal:
+    # Cliente em processo para testes: passa pelo mesmo roteamento e pelo
+    # mesmo agrupador do servidor, sem abrir sockets.
+    #
+    #     async with ClienteLocal(ServicoPredicao()) as cliente:
+    #         status, resposta = await cliente.post('/prever', paciente)
+    def __init__(self, servico):
+        self.servico = servico
+
+    async def __aenter__(self):
+        await self.servico.iniciar()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.servico.parar()
+
+    async def get(self, caminho):
+        return await self.servico.tratar('GET', caminho, b'')
+
+    async def post(self, caminho, dados):
+        return await self.servico.tratar('POST', caminho, json.dumps(dados).encode('utf-8'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP de pontuação com micro-lotes.")
+    parser.add_argument('--modelo', default=MODELO_PADRAO, help="Caminho do pipeline .pkl")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8000)
+    parser.add_argument('--max-lote', type=int, default=64, help="Máximo de pacientes por lote")
+    parser.add_argument('--max-espera-ms', type=float, default=5.0,
+                        help="Tempo máximo de espera para completar um lote")
+    args = parser.parse_args(argv)
+
+    servico = ServicoPredicao(args.modelo, args.max_lote, args.max_espera_ms)
+    try:
+        asyncio.run(servico.servir(args.host, args.porta))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""Pré-carga do servidor forkserver do pool de render_paralelo.
+
+Importado só dentro do servidor forkserver (set_forkserver_preload), nunca
+no processo do app. Cada processo que nasce do servidor recebe do pai os
+dados de preparação do multiprocessing, entre eles o caminho do __main__ de
+quem chamou, e reexecuta esse arquivo antes de rodar a tarefa. No Streamlit
+o __main__ é o app.py, que rodaria inteiro em cada processo (base, cubo,
+aquecimento, porta de métricas).
+
+As tarefas do pool são funções de obesidade.render_paralelo, importáveis
+pelo nome, então os processos não precisam do __main__: aqui a etapa é
+desligada no próprio servidor, de onde ela é herdada pelos filhos. O
+__main__ do processo do app não é tocado.
+
+O servidor importa este módulo pelo sys.path com que nasce (diretório
+atual e PYTHONPATH); se a importação falhar, o multiprocessing a ignora em
+silêncio e os processos voltam a reexecutar o __main__.
+"""
+from multiprocessing import spawn
+
+import obesidade.graficos  # noqa: F401  (importado uma vez, herdado pelos filhos)
+
+
+def _manter_main(*args, **kwargs):
+    return None
+
+
+spawn._fixup_main_from_path = _manter_main
+spawn._fixup_main_from_name = _manter_main
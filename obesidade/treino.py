@@ -0,0 +1,451 @@
+"""Treino reprodutível do modelo de obesidade (versão em módulo do notebook).
+
+Uso:
+    python -m obesidade.treino --dados data/Obesity.csv --saida models --publicar
+
+Monta o mesmo pipeline do notebook (arredondamento + StandardScaler,
+OrdinalEncoder, OneHotEncoder e RandomForestClassifier), faz a busca de
+hiperparâmetros com validação cruzada em todos os núcleos (pool de
+processos do joblib) e reaproveita o pré-processamento já ajustado entre
+os candidatos. Cada execução grava um artefato versionado
+(modelo_obesidade-<versao>.pkl), um .json com métricas, hash dos dados,
+hiperparâmetros e tempo de ajuste, e a linha de base do monitor de deriva
+(modelo_obesidade-<versao>.drift.json, ver obesidade.drift).
+
+Para bases maiores que a memória, --em-blocos treina lendo o arquivo em
+blocos (treinar_em_blocos): a primeira passada ajusta o StandardScaler
+(partial_fit) e os vocabulários das categóricas; depois, cada grupo de
+árvores é ajustado numa parte aleatória de tamanho limitado da base
+inteira e os grupos são reunidos num único RandomForestClassifier, com o
+mesmo esquema de pipeline do app. O arquivo é lido três vezes, qualquer
+que seja o número de grupos: a segunda passada distribui as linhas de
+treino já transformadas em arquivos temporários, um por grupo, e cada
+grupo é ajustado a partir do seu arquivo.
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import classification_report
+from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, OrdinalEncoder, StandardScaler
+
+from obesidade.dados import arquivo_base, carregar_base
+from obesidade.drift import MonitorDrift, caminho_linha_de_base, salvar_linha_de_base
+from obesidade.lote import ler_blocos
+from obesidade.nucleo import arredondar_valores, cols_modelo, cols_nominais, cols_numericas, cols_ordinais
+from obesidade.registro import hash_arquivo
+
+COLUNA_ALVO = 'Obesity'
+
+# Configuração do notebook: max_depth=15 e min_samples_leaf=2 contra overfitting
+PARAMETROS_PADRAO = {'n_estimators': 100, 'max_depth': 15, 'min_samples_leaf': 2}
+
+grades = {
+    'padrao': {
+        'model__n_estimators': [100, 200],
+        'model__max_depth': [10, 15, None],
+        'model__min_samples_leaf': [1, 2, 4],
+    },
+    'rapida': {
+        'model__n_estimators': [100],
+        'model__max_depth': [10, 15],
+        'model__min_samples_leaf': [2],
+    },
+}
+
+
+def construir_preprocessador(categorias_nominais=None):
+    transformer_num = Pipeline([
+        ('arredondar', FunctionTransformer(arredondar_valores, validate=False)),
+        ('scaler', StandardScaler())
+    ])
+    transformer_ord = OrdinalEncoder(
+        categories=[['no', 'Sometimes', 'Frequently', 'Always']] * len(cols_ordinais),
+        handle_unknown='use_encoded_value', unknown_value=-1
+    )
+    # categorias_nominais: vocabulário já conhecido (treino em blocos); senão, aprendido no fit
+    transformer_nom = OneHotEncoder(categories=categorias_nominais or 'auto', handle_unknown='ignore')
+    return ColumnTransformer([
+        ('num', transformer_num, cols_numericas),
+        ('ord', transformer_ord, cols_ordinais),
+        ('nom', transformer_nom, cols_nominais)
+    ])
+
+
+def construir_pipeline(parametros=None, random_state=42, memory=None):
+    parametros = {**PARAMETROS_PADRAO, **(parametros or {})}
+    return Pipeline([
+        ('preprocessor', construir_preprocessador()),
+        ('model', RandomForestClassifier(random_state=random_state, **parametros))
+    ], memory=memory)
+
+
+def carregar_treino(caminho_dados):
+    df = carregar_base(caminho_dados, colunas=cols_modelo + [COLUNA_ALVO])
+    X = df[cols_modelo].copy()
+    # O modelo é treinado com rótulos em texto (como no notebook)
+    y = df[COLUNA_ALVO].astype(str)
+    # Categóricas voltam a texto para o pipeline ver os mesmos valores do CSV
+    for c in cols_ordinais + cols_nominais:
+        X[c] = X[c].astype(str)
+    return X, y
+
+
+def treinar(caminho_dados, grade='padrao', cv=5, n_jobs=-1, random_state=42, verbose=0):
+    X, y = carregar_treino(caminho_dados)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, stratify=y, random_state=random_state)
+
+    cache = tempfile.mkdtemp(prefix='obesidade-treino-')
+    try:
+        # O ColumnTransformer ajustado em cada dobra fica em cache e é
+        # reaproveitado por todos os candidatos da grade
+        memoria = joblib.Memory(cache, verbose=0)
+        busca = GridSearchCV(
+            construir_pipeline(random_state=random_state, memory=memoria),
+            grades[grade] if isinstance(grade, str) else grade,
+            cv=StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state),
+            scoring='accuracy',
+            n_jobs=n_jobs,
+            refit=True,
+            verbose=verbose,
+        )
+        inicio = time.perf_counter()
+        busca.fit(X_train, y_train)
+        tempo_busca = time.perf_counter() - inicio
+        pipeline = busca.best_estimator_
+        pipeline.set_params(memory=None)
+    finally:
+        shutil.rmtree(cache, ignore_errors=True)
+
+    acc_treino = pipeline.score(X_train, y_train)
+    acc_teste = pipeline.score(X_test, y_test)
+    previsto_teste = pipeline.predict(X_test)
+
+    # Linha de base do monitor de deriva: entradas do treino e classes previstas no teste
+    drift = MonitorDrift.para_dados(X_train)
+    drift.observar(X_train)
+    drift.observar_classes(previsto_teste)
+    metricas = {
+        'acuracia_treino': acc_treino,
+        'acuracia_teste': acc_teste,
+        'gap': acc_treino - acc_teste,
+        'acuracia_cv': busca.best_score_,
+        'relatorio_teste': classification_report(y_test, previsto_teste, output_dict=True),
+    }
+    metadados = {
+        'dados': os.path.abspath(arquivo_base(caminho_dados)),
+        'dados_sha256': hash_arquivo(arquivo_base(caminho_dados)),
+        'linhas': int(len(X)),
+        'melhores_parametros': {k.replace('model__', ''): v for k, v in busca.best_params_.items()},
+        'candidatos': len(busca.cv_results_['params']),
+        'dobras_cv': cv,
+        'tempo_busca_s': tempo_busca,
+        'tempo_ajuste_final_s': busca.refit_time_,
+        'metricas': metricas,
+        'linha_de_base_drift': drift.instantaneo(),
+    }
+    return pipeline, metadados
+
+
+def _mascara_teste(inicio, n, fracao_teste):
+    # Divisão determinística pela posição da linha no arquivo: a cada
+    # round(1/fracao_teste) linhas, uma vai para o teste
+    passo = max(int(round(1 / fracao_teste)), 2) if fracao_teste else 0
+    return (np.arange(inicio, inicio + n) % passo == 0) if passo else np.zeros(n, dtype=bool)
+
+
+def _vocabulario_e_escala(caminho_dados, tamanho_bloco, fracao_teste, rng, amostra_drift=100_000):
+    # Passada 1: média/variância das numéricas (após o arredondamento do
+    # pipeline), vocabulário das categóricas, classes e número de linhas.
+    # Também guarda uma amostra uniforme das numéricas de treino (as
+    # amostra_drift linhas com as menores chaves aleatórias), de onde saem as
+    # faixas do monitor de deriva, sem depender da ordem do arquivo
+    scaler = StandardScaler()
+    vocabulario = {c: set() for c in cols_ordinais + cols_nominais}
+    classes = set()
+    linhas = 0
+    amostra = None
+    for bloco in ler_blocos(caminho_dados, tamanho_bloco):
+        scaler.partial_fit(arredondar_valores(bloco[cols_numericas]))
+        for c in vocabulario:
+            vocabulario[c].update(bloco[c].astype(str).unique())
+        classes.update(bloco[COLUNA_ALVO].astype(str).unique())
+        treino = bloco.loc[~_mascara_teste(linhas, len(bloco), fracao_teste), cols_numericas]
+        treino = treino.assign(_chave=rng.random(len(treino)))
+        amostra = treino if amostra is None else pd.concat([amostra, treino])
+        amostra = amostra.nsmallest(amostra_drift, '_chave')
+        linhas += len(bloco)
+    return (scaler, {c: sorted(v) for c, v in vocabulario.items()}, sorted(classes), linhas,
+            amostra[cols_numericas])
+
+
+def _separar(bloco, inicio, fracao_teste):
+    X = bloco[cols_modelo].copy()
+    for c in cols_ordinais + cols_nominais:
+        X[c] = X[c].astype(str)
+    y = bloco[COLUNA_ALVO].astype(str).to_numpy()
+    return X, y, _mascara_teste(inicio, len(bloco), fracao_teste)
+
+
+def _distribuir_grupos(caminho_dados, tamanho_bloco, preprocessor, fracao_teste, probabilidade,
+                       classes, pasta, grupos, rng, drift):
+    # Passada 2: cada linha de treino sorteada vai para um grupo de árvores e
+    # é anexada, já transformada, ao arquivo do grupo (float32 denso, o tipo
+    # que a floresta usa internamente; rótulos como índice em classes). A
+    # mesma passada conta a base de treino no monitor de deriva.
+    # Em memória fica só o bloco atual. Devolve o número de colunas transformadas
+    arquivos = [(open(os.path.join(pasta, f'grupo{g}.X'), 'wb'), open(os.path.join(pasta, f'grupo{g}.y'), 'wb'))
+                for g in range(grupos)]
+    classes = np.asarray(classes)
+    colunas = None
+    posicao = 0
+    try:
+        for bloco in ler_blocos(caminho_dados, tamanho_bloco):
+            X, y, teste = _separar(bloco, posicao, fracao_teste)
+            posicao += len(bloco)
+            drift.observar(X[~teste])
+            sorteio = ~teste & (rng.random(len(bloco)) < probabilidade)
+            if not sorteio.any():
+                continue
+            Xt = preprocessor.transform(X[sorteio])
+            Xt = np.asarray(Xt.toarray() if sparse.issparse(Xt) else Xt, dtype=np.float32)
+            yt = np.searchsorted(classes, y[sorteio]).astype(np.int16)
+            colunas = Xt.shape[1]
+            grupo = rng.integers(grupos, size=len(Xt))
+            for g, (arquivo_X, arquivo_y) in enumerate(arquivos):
+                selecao = grupo == g
+                Xt[selecao].tofile(arquivo_X)
+                yt[selecao].tofile(arquivo_y)
+    finally:
+        for arquivo_X, arquivo_y in arquivos:
+            arquivo_X.close()
+            arquivo_y.close()
+    return colunas
+
+
+def treinar_em_blocos(caminho_dados, tamanho_bloco=500_000, amostra=1_000_000, parametros=None,
+                      fracao_teste=0.2, max_amostras=None, random_state=42, n_jobs=-1, pasta_temporaria=None):
+    # amostra: máximo de linhas em memória ao ajustar cada grupo de árvores.
+    # As linhas de treino são repartidas ao acaso entre os grupos, então
+    # cada grupo vê uma parte da base inteira e, juntos, cobrem todas as
+    # linhas (ou uma amostra uniforme delas, se nem n_estimators grupos
+    # bastarem). O arquivo é lido três vezes (vocabulário, distribuição nos
+    # grupos e avaliação); os grupos ocupam em disco, em pasta_temporaria,
+    # cerca de 4 bytes x colunas transformadas x linhas de treino
+    inicio = time.perf_counter()
+    parametros = {**PARAMETROS_PADRAO, **(parametros or {})}
+    rng = np.random.default_rng(random_state)
+    scaler, vocabulario, classes, linhas, amostra_drift = _vocabulario_e_escala(
+        caminho_dados, tamanho_bloco, fracao_teste, rng)
+    linhas_treino = linhas * (1 - fracao_teste)
+    grupos = int(min(parametros['n_estimators'], max(1, np.ceil(linhas_treino / amostra))))
+    probabilidade = min(1.0, amostra * grupos / linhas_treino) if linhas_treino else 1.0
+    arvores = np.diff(np.linspace(0, parametros['n_estimators'], grupos + 1).round().astype(int))
+
+    # Vocabulário da base inteira; as estatísticas do scaler vêm da passada 1
+    leitor = ler_blocos(caminho_dados, tamanho_bloco)
+    X, _, _ = _separar(next(leitor), 0, fracao_teste)
+    leitor.close()
+    preprocessor = construir_preprocessador([vocabulario[c] for c in cols_nominais]).fit(X)
+    preprocessor.named_transformers_['num'].steps[-1] = ('scaler', scaler)
+    # Faixas tiradas da amostra da base inteira, contagens da base de treino inteira
+    drift = MonitorDrift.para_dados(amostra_drift)
+
+    pasta = tempfile.mkdtemp(prefix='obesidade-blocos-', dir=pasta_temporaria)
+    try:
+        colunas = _distribuir_grupos(caminho_dados, tamanho_bloco, preprocessor, fracao_teste,
+                                     probabilidade, classes, pasta, grupos, rng, drift)
+        if colunas is None:
+            raise ValueError(f"Nenhuma linha de treino em '{caminho_dados}'.")
+
+        floresta = None
+        for g, n_arvores in enumerate(arvores):
+            Xt = np.fromfile(os.path.join(pasta, f'grupo{g}.X'), dtype=np.float32).reshape(-1, colunas)
+            yt = np.asarray(classes)[np.fromfile(os.path.join(pasta, f'grupo{g}.y'), dtype=np.int16)]
+            # Uma linha de peso zero por classe garante que toda árvore conheça
+            # todas as classes (e na mesma ordem), mesmo as ausentes do grupo
+            Xt = np.vstack([Xt, np.zeros((len(classes), colunas), dtype=np.float32)])
+            yt = np.concatenate([yt, classes])
+            peso = np.concatenate([np.ones(len(yt) - len(classes)), np.zeros(len(classes))])
+
+            parcial = RandomForestClassifier(
+                **{**parametros, 'n_estimators': int(n_arvores)},
+                max_samples=max_amostras, n_jobs=n_jobs,
+                random_state=int(rng.integers(2 ** 31 - 1)),
+            ).fit(Xt, yt, sample_weight=peso)
+            if floresta is None:
+                floresta = parcial
+            else:
+                floresta.estimators_.extend(parcial.estimators_)
+            del Xt, yt, peso
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    # Floresta única: os atributos ajustados (classes_, n_features_in_...) são os do primeiro grupo
+    floresta.n_estimators = len(floresta.estimators_)
+    # n_jobs só vale para o ajuste: no pipeline salvo, paralelizar a
+    # previsão tornaria predict_proba não determinístico (ordem das somas)
+    # e poria threads em cada previsão de uma linha no app e no serviço
+    floresta.set_params(random_state=random_state, n_jobs=None)
+    pipeline = Pipeline([('preprocessor', preprocessor), ('model', floresta)])
+    tempo_ajuste = time.perf_counter() - inicio
+
+    # Passada 3 (avaliação): matriz de confusão acumulada nas linhas de
+    # teste; as classes previstas completam a linha de base de deriva
+    confusao = np.zeros((len(classes), len(classes)), dtype=np.int64)
+    indice = {c: i for i, c in enumerate(floresta.classes_)}
+    posicao = 0
+    for bloco in ler_blocos(caminho_dados, tamanho_bloco):
+        X, y, teste = _separar(bloco, posicao, fracao_teste)
+        posicao += len(bloco)
+        if teste.any():
+            previsto = pipeline.predict(X[teste])
+            drift.observar_classes(previsto)
+            np.add.at(confusao, ([indice[c] for c in y[teste]], [indice[c] for c in previsto]), 1)
+
+    acertos, total = np.trace(confusao), confusao.sum()
+    diagonal, suporte, previstos = np.diag(confusao), confusao.sum(axis=1), confusao.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precisao = np.nan_to_num(diagonal / previstos)
+        recall = np.nan_to_num(diagonal / suporte)
+        f1 = np.nan_to_num(2 * precisao * recall / (precisao + recall))
+    metricas = {
+        'acuracia_teste': acertos / total if total else float('nan'),
+        'linhas_teste': int(total),
+        'relatorio_teste': {c: {'precision': float(p), 'recall': float(r), 'f1-score': float(f), 'support': int(n)}
+                            for c, p, r, f, n in zip(floresta.classes_, precisao, recall, f1, suporte)},
+        'matriz_confusao': confusao.tolist(),
+    }
+    metadados = {
+        'dados': os.path.abspath(caminho_dados),
+        'dados_sha256': hash_arquivo(caminho_dados),
+        'linhas': int(linhas),
+        'modo': 'em_blocos',
+        'tamanho_bloco': tamanho_bloco,
+        'amostra': amostra,
+        'grupos': grupos,
+        'parametros': {**parametros, 'max_samples': max_amostras},
+        'vocabulario': vocabulario,
+        'tempo_ajuste_s': tempo_ajuste,
+        'metricas': metricas,
+        'linha_de_base_drift': drift.instantaneo(),
+    }
+    return pipeline, metadados
+
+
+def _reservar_versao(pasta, nome):
+    # A versão tem resolução de segundos: o .pkl é criado com exclusividade
+    # e execuções no mesmo segundo (inclusive em paralelo) ficam com -2, -3...
+    # em vez de sobrescrever o artefato uma da outra
+    carimbo = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    for n in itertools.count(1):
+        versao = carimbo if n == 1 else f'{carimbo}-{n}'
+        caminho = os.path.join(pasta, f'{nome}-{versao}.pkl')
+        try:
+            return versao, caminho, open(caminho, 'xb')
+        except FileExistsError:
+            continue
+
+
+def salvar_artefato(pipeline, metadados, pasta='models', nome='modelo_obesidade', publicar=False):
+    import sklearn
+
+    os.makedirs(pasta, exist_ok=True)
+    versao, caminho_modelo, arquivo = _reservar_versao(pasta, nome)
+    caminho_meta = os.path.join(pasta, f'{nome}-{versao}.json')
+
+    try:
+        with arquivo:
+            joblib.dump(pipeline, arquivo)
+    except BaseException:
+        # Não deixa um .pkl pela metade ocupando a versão
+        os.remove(caminho_modelo)
+        raise
+    # A linha de base do monitor de deriva vai para um arquivo próprio ao lado do modelo
+    metadados = dict(metadados)
+    drift = metadados.pop('linha_de_base_drift', None)
+    if drift is not None:
+        salvar_linha_de_base(drift, caminho_linha_de_base(caminho_modelo))
+    metadados = {
+        **metadados,
+        'versao': versao,
+        'modelo': os.path.basename(caminho_modelo),
+        'modelo_sha256': hash_arquivo(caminho_modelo),
+        'sklearn': sklearn.__version__,
+    }
+    with open(caminho_meta, 'w', encoding='utf-8') as f:
+        json.dump(metadados, f, indent=2, ensure_ascii=False, default=str)
+
+    if publicar:
+        # Troca atômica: o registro de modelos do app percebe a mudança e recarrega
+        destino = os.path.join(pasta, f'{nome}.pkl')
+        temporario = destino + '.tmp'
+        shutil.copyfile(caminho_modelo, temporario)
+        if drift is not None:
+            salvar_linha_de_base(drift, caminho_linha_de_base(destino))
+        os.replace(temporario, destino)
+    return caminho_modelo, caminho_meta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Treina o modelo de obesidade com busca de hiperparâmetros.")
+    parser.add_argument('--dados', default='data/Obesity.csv',
+                        help="CSV de treino (usa o .arrow ao lado quando estiver atualizado)")
+    parser.add_argument('--saida', default='models', help="Pasta dos artefatos versionados")
+    parser.add_argument('--grade', choices=sorted(grades), default='padrao', help="Grade de hiperparâmetros")
+    parser.add_argument('--cv', type=int, default=5, help="Número de dobras da validação cruzada")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="Processos da busca (-1 = todos os núcleos)")
+    parser.add_argument('--em-blocos', action='store_true',
+                        help="Treina lendo o arquivo em blocos (bases maiores que a memória), sem busca em grade")
+    parser.add_argument('--tamanho-bloco', type=int, default=500_000, help="Linhas por bloco no modo --em-blocos")
+    parser.add_argument('--amostra', type=int, default=1_000_000,
+                        help="Máximo de linhas em memória por grupo de árvores no modo --em-blocos")
+    parser.add_argument('--max-amostras', type=float, default=None,
+                        help="Fração da amostra sorteada (bootstrap) por árvore no modo --em-blocos")
+    parser.add_argument('--pasta-temporaria', default=None,
+                        help="Onde gravar os grupos de treino no modo --em-blocos (padrão: pasta temporária do sistema)")
+    parser.add_argument('--publicar', action='store_true',
+                        help="Também substitui models/modelo_obesidade.pkl (usado pelo app)")
+    args = parser.parse_args(argv)
+
+    print("Treinando o modelo Random Forest...")
+    if args.em_blocos:
+        # O CSV é lido diretamente (o .arrow ao lado não é usado neste modo)
+        pipeline, metadados = treinar_em_blocos(args.dados, args.tamanho_bloco, args.amostra,
+                                                max_amostras=args.max_amostras, n_jobs=args.n_jobs,
+                                                pasta_temporaria=args.pasta_temporaria)
+        caminho_modelo, caminho_meta = salvar_artefato(pipeline, metadados, args.saida, publicar=args.publicar)
+        m = metadados['metricas']
+        print(f"{metadados['linhas']:,} linhas, {metadados['grupos']} grupo(s) de árvores, "
+              f"{metadados['tempo_ajuste_s']:.1f}s | Teste: {m['acuracia_teste']:.2%} ({m['linhas_teste']:,} linhas)")
+        print(f"\nModelo salvo com sucesso em: '{caminho_modelo}' (metadados em '{caminho_meta}')")
+        return
+
+    pipeline, metadados = treinar(args.dados, args.grade, args.cv, args.n_jobs)
+    caminho_modelo, caminho_meta = salvar_artefato(pipeline, metadados, args.saida, publicar=args.publicar)
+
+    m = metadados['metricas']
+    print(f"Melhores parâmetros: {metadados['melhores_parametros']}")
+    print(f"Acurácia CV: {m['acuracia_cv']:.2%} | Treino: {m['acuracia_treino']:.2%} | Teste: {m['acuracia_teste']:.2%}")
+    if m['gap'] > 0.10:
+        print(f"ALERTA: Gap de {m['gap']:.1%}. Indício de Overfitting!")
+    print(f"Busca: {metadados['candidatos']} candidatos em {metadados['tempo_busca_s']:.1f}s")
+    print(f"\nModelo salvo com sucesso em: '{caminho_modelo}' (metadados em '{caminho_meta}')")
+
+
+if __name__ == '__main__':
+    main()
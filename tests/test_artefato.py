@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from obesidade.artefato import FlorestaCompacta, exportar, verificar
+from obesidade.treino import carregar_treino, construir_pipeline
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def treino():
+    return carregar_treino(os.path.join(RAIZ, 'data', 'Obesity.csv'))
+
+
+@pytest.fixture(scope='module')
+def pipeline(treino):
+    return construir_pipeline({'n_estimators': 20}).fit(*treino)
+
+
+@pytest.fixture(scope='module')
+def dados():
+    return pd.read_csv(os.path.join(RAIZ, 'data', 'Obesity.csv'))
+
+
+def test_ida_e_volta_identica_ao_pipeline(pipeline, dados, tmp_path):
+    caminho = str(tmp_path / 'modelo.flor')
+    assert exportar(pipeline, caminho)['exato']
+    assert not os.path.exists(caminho + '.tmp')
+    compacta = FlorestaCompacta.carregar(caminho)
+    X = dados[compacta.colunas]
+    assert np.array_equal(compacta.predict_proba(X), pipeline.predict_proba(X))
+    assert list(compacta.predict(X)) == list(pipeline.predict(X))
+    resultado = verificar(pipeline, compacta, dados)
+    assert resultado['probabilidades_identicas'] and resultado['maior_diferenca'] == 0.0
+
+    # Regravar a partir do próprio artefato mapeado não muda nada
+    copia = str(tmp_path / 'copia.flor')
+    compacta.salvar(copia)
+    assert np.array_equal(FlorestaCompacta.carregar(copia).predict_proba(X), pipeline.predict_proba(X))
+
+
+def test_folhas_quantizadas_preservam_classes(treino, dados, tmp_path):
+    pipeline = construir_pipeline({'n_estimators': 10, 'class_weight': 'balanced'}).fit(*treino)
+    caminho = str(tmp_path / 'modelo.flor')
+    assert not exportar(pipeline, caminho)['exato']
+    resultado = verificar(pipeline, FlorestaCompacta.carregar(caminho), dados)
+    assert resultado['classes_identicas']
+    assert resultado['maior_diferenca'] < 1e-4
+
+
+def test_arquivo_invalido(tmp_path):
+    caminho = tmp_path / 'modelo.flor'
+    caminho.write_bytes(b'nada disso')
+    with pytest.raises(ValueError):
+        FlorestaCompacta.carregar(str(caminho))
@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from obesidade.cache_predicao import CachePredicoes
+from obesidade.nucleo import cols_modelo
+from obesidade.treino import carregar_treino, construir_pipeline
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def pipeline():
+    X, y = carregar_treino(os.path.join(RAIZ, 'data', 'Obesity.csv'))
+    return construir_pipeline({'n_estimators': 20}).fit(X, y)
+
+
+@pytest.fixture(scope='module')
+def registros():
+    # Envios possíveis do formulário: Idade inteira, Altura e Peso no passo 0,01
+    dados = pd.read_csv(os.path.join(RAIZ, 'data', 'Obesity.csv'))[cols_modelo].sample(60, random_state=0)
+    dados['Age'] = dados['Age'].round().astype(int)
+    dados[['Height', 'Weight']] = dados[['Height', 'Weight']].round(2)
+    return dados.to_dict('records')
+
+
+def test_previsao_igual_a_do_pipeline(pipeline, registros):
+    cache = CachePredicoes()
+    for registro in registros:
+        esperado = pipeline.predict_proba(pd.DataFrame([registro], columns=cols_modelo))[0]
+        for _ in range(2):  # falha e acerto
+            resultado = cache.prever(pipeline, registro, versao='v1')
+            assert np.array_equal(list(resultado['probabilidades'].values()), esperado)
+            assert resultado['classe'] == pipeline.classes_[int(np.argmax(esperado))]
+    assert cache.acertos >= len(registros)
+
+
+def test_passo_do_peso_nao_e_agrupado(pipeline, registros):
+    cache = CachePredicoes()
+    registro = dict(registros[0], Weight=80.37)
+    vizinho = dict(registro, Weight=80.38)
+    assert cache.chave(registro) != cache.chave(vizinho)
+    for r in (registro, vizinho):
+        esperado = pipeline.predict_proba(pd.DataFrame([r], columns=cols_modelo))[0]
+        assert np.array_equal(list(cache.prever(pipeline, r)['probabilidades'].values()), esperado)
+
+
+def test_resultado_devolvido_e_uma_copia(pipeline, registros):
+    cache = CachePredicoes()
+    primeiro = cache.prever(pipeline, registros[0])
+    guardado = {'classe': primeiro['classe'], 'probabilidades': dict(primeiro['probabilidades'])}
+    primeiro['classe'] = 'alterada'
+    primeiro['probabilidades'].clear()
+    assert cache.prever(pipeline, registros[0]) == guardado
@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from obesidade import compilado
+from obesidade.compilado import FlorestaCompilada, compilar_pipeline
+from obesidade.treino import carregar_treino, construir_pipeline
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def pipeline():
+    X, y = carregar_treino(os.path.join(RAIZ, 'data', 'Obesity.csv'))
+    return construir_pipeline({'n_estimators': 20}).fit(X, y)
+
+
+@pytest.fixture(scope='module')
+def dados():
+    return pd.read_csv(os.path.join(RAIZ, 'data', 'Obesity.csv'))
+
+
+def test_probabilidades_identicas_ao_pipeline(pipeline, dados):
+    compilada = compilar_pipeline(pipeline)
+    X = dados[compilada.colunas]
+    esperado = pipeline.predict_proba(X)
+    obtido = compilada.predict_proba(X)
+    assert obtido.dtype == esperado.dtype
+    assert np.array_equal(obtido, esperado)
+    assert list(compilada.predict(X)) == list(pipeline.predict(X))
+
+
+def test_blocos_nao_mudam_o_resultado(pipeline, dados, monkeypatch):
+    compilada = compilar_pipeline(pipeline)
+    X = dados[compilada.colunas]
+    monkeypatch.setattr(compilado, 'LINHAS_POR_BLOCO', 300)
+    assert np.array_equal(compilada.predict_proba(X), pipeline.predict_proba(X))
+
+
+def test_salvar_e_carregar(pipeline, dados, tmp_path):
+    caminho = str(tmp_path / 'modelo.npz')
+    compilar_pipeline(pipeline).salvar(caminho)
+    carregada = FlorestaCompilada.carregar(caminho)
+    X = dados[carregada.colunas]
+    assert np.array_equal(carregada.predict_proba(X), pipeline.predict_proba(X))
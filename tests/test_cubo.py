@@ -0,0 +1,125 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from obesidade.cubo import CuboAgregado, colunas_dashboard
+from obesidade.dados import carregar_base
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def base():
+    return carregar_base(os.path.join(RAIZ, 'data', 'Obesity.csv'), colunas=colunas_dashboard)
+
+
+@pytest.fixture(scope='module')
+def cubo(base):
+    return CuboAgregado.de_dataframe(base)
+
+
+def _selecionar(base, filtros):
+    # Mesma seleção feita com pandas sobre as linhas
+    m = np.ones(len(base), dtype=bool)
+    for col, aceitos in filtros.items():
+        m &= base[col].astype(str).isin(aceitos).to_numpy()
+    sub = base[m].copy()
+    sub['IMC'] = sub['Weight'].astype('float64') / sub['Height'].astype('float64') ** 2
+    return sub
+
+
+def _crosstab(sub, linhas, colunas):
+    ct = pd.crosstab(sub[linhas].astype(str), sub[colunas].astype(str))
+    return ct.rename_axis(index=linhas, columns=colunas)
+
+
+def _mesma_tabela(obtida, esperada):
+    obtida = obtida.rename(index=str, columns=str)
+    assert sorted(obtida.index) == sorted(esperada.index)
+    assert sorted(obtida.columns) == sorted(esperada.columns)
+    assert (obtida.loc[esperada.index, esperada.columns].to_numpy() == esperada.to_numpy()).all()
+
+
+filtros_exemplo = {
+    'Gender': ['Male'],
+    'family_history': ['yes'],
+    'MTRANS': ['Public_Transportation', 'Automobile'],
+}
+
+
+def test_tabela_igual_crosstab(base, cubo):
+    sub = _selecionar(base, filtros_exemplo)
+    filtrado = cubo.filtrar(filtros_exemplo)
+    assert filtrado.total() == len(sub)
+    _mesma_tabela(filtrado.tabela('Obesity_PT', 'CAEC'), _crosstab(sub, 'Obesity_PT', 'CAEC'))
+    _mesma_tabela(filtrado.tabela('Faixa_Etaria', 'SMOKE'), _crosstab(sub, 'Faixa_Etaria', 'SMOKE'))
+    normalizada = filtrado.tabela('Obesity_PT', 'CAEC', normalizar=True)
+    assert np.allclose(normalizada.sum(axis=1), 1.0)
+
+
+@pytest.mark.parametrize('medida', ['Age', 'Weight', 'IMC', 'CH2O'])
+def test_media_e_desvio_iguais_groupby(base, cubo, medida):
+    sub = _selecionar(base, filtros_exemplo)
+    filtrado = cubo.filtrar(filtros_exemplo)
+    valores = sub[medida].astype('float64')
+    grupos = valores.groupby(sub['Obesity'].astype(str))
+    assert np.isclose(filtrado.media(medida), valores.mean())
+    assert np.isclose(filtrado.desvio(medida), valores.std())
+    media = filtrado.media(medida, 'Obesity').rename(index=str)
+    desvio = filtrado.desvio(medida, 'Obesity').rename(index=str)
+    assert np.allclose(media[grupos.mean().index], grupos.mean())
+    assert np.allclose(desvio[grupos.std().index], grupos.std(), equal_nan=True)
+
+
+def test_histograma_igual_contagens(base, cubo):
+    sub = _selecionar(base, filtros_exemplo)
+    histograma = cubo.filtrar(filtros_exemplo).histograma('Age', 'Obesity_PT')
+    intervalos = np.floor(sub['Age'].astype('float64') + 0.5)
+    esperado = intervalos.groupby(sub['Obesity_PT'].astype(str)).value_counts()
+    assert sorted(map(str, histograma)) == sorted(esperado.index.get_level_values(0).unique())
+    for categoria, (centros, contagens) in histograma.items():
+        serie = esperado[str(categoria)].sort_index()
+        assert np.array_equal(centros, serie.index.to_numpy())
+        assert np.array_equal(contagens, serie.to_numpy())
+
+
+def test_combinar_igual_cubo_da_base_inteira(base, cubo):
+    metade = len(base) // 2
+    combinado = (CuboAgregado.de_dataframe(base.iloc[:metade])
+                 .combinar(CuboAgregado.de_dataframe(base.iloc[metade:])))
+    assert combinado.total() == cubo.total()
+    esperada = cubo.tabela('Obesity_PT', 'MTRANS').rename(index=str, columns=str)
+    _mesma_tabela(combinado.tabela('Obesity_PT', 'MTRANS'), esperada)
+    assert np.allclose(combinado.media('Weight', 'Gender').sort_index(), cubo.media('Weight', 'Gender').sort_index())
+    for medida in ('Age', 'TUE'):
+        a, b = combinado.histograma(medida, 'Gender'), cubo.histograma(medida, 'Gender')
+        assert a.keys() == b.keys()
+        for categoria in a:
+            assert np.array_equal(a[categoria][0], b[categoria][0])
+            assert np.array_equal(a[categoria][1], b[categoria][1])
+    with pytest.raises(ValueError):
+        cubo.combinar(CuboAgregado.de_dataframe(base, resolucao={'Age': 2.0}))
+
+
+def test_selecao_vazia(cubo):
+    vazio = cubo.filtrar({'MTRANS': []})
+    assert vazio.total() == 0
+    assert np.isnan(vazio.media('Age'))
+    assert vazio.tabela('Obesity_PT', 'CAEC').empty
+    assert vazio.histograma('Age', 'Obesity_PT') == {}
+    assert vazio.contagem('Gender').sum() == 0
+
+
+def test_filtro_de_uma_classe(base, cubo):
+    filtros = {'MTRANS': ['Walking']}
+    sub = _selecionar(base, filtros)
+    filtrado = cubo.filtrar(filtros)
+    assert filtrado.total() == len(sub)
+    assert list(filtrado.contagem('MTRANS').index) == ['Walking']
+    assert list(filtrado.tabela('Obesity_PT', 'MTRANS').columns) == ['Walking']
+    assert list(filtrado.histograma('Age', 'MTRANS')) == ['Walking']
+    _mesma_tabela(filtrado.tabela('Obesity_PT', 'Gender'), _crosstab(sub, 'Obesity_PT', 'Gender'))
+    # As opções dos filtros continuam sendo as da base inteira
+    assert filtrado.valores('MTRANS') == cubo.valores('MTRANS')
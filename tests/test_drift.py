@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from obesidade.drift import LINHAS_MINIMAS, MonitorDrift, linha_de_base, nivel_psi, psi
+from obesidade.nucleo import cols_modelo
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def dados():
+    return pd.read_csv(os.path.join(RAIZ, 'data', 'Obesity.csv'))[cols_modelo]
+
+
+@pytest.fixture(scope='module')
+def base(dados):
+    return linha_de_base(dados)
+
+
+def test_psi_e_niveis():
+    contagens = [30, 50, 80, 120, 150, 150, 120, 80, 50, 30]
+    assert psi(contagens, contagens) == 0.0
+    # Só as proporções importam
+    assert psi(contagens, [3 * n for n in contagens]) == pytest.approx(0.0, abs=1e-12)
+    deslocada = contagens[3:] + [0, 0, 0]
+    assert psi(contagens, deslocada) > 0.25
+    assert [nivel_psi(v) for v in (0.0, 0.05, 0.1, 0.2, 0.25, 3.0)] == [
+        'estavel', 'estavel', 'moderado', 'moderado', 'significativo', 'significativo']
+
+
+def test_mesma_distribuicao_nao_alerta(dados, base):
+    monitor = MonitorDrift.de_linha_de_base(base)
+    monitor.observar(dados.sample(frac=1.0, random_state=0))
+    relatorio = monitor.relatorio()
+    assert relatorio['amostra_suficiente']
+    assert relatorio['psi_maximo'] == pytest.approx(0.0, abs=1e-12)
+    assert {v['nivel'] for v in relatorio['variaveis']} == {'estavel'}
+
+
+def test_distribuicao_deslocada_alerta(dados, base):
+    monitor = MonitorDrift.de_linha_de_base(base)
+    deslocados = dados.assign(Weight=dados['Weight'] + 30, MTRANS='Walking')
+    monitor.observar(deslocados)
+    niveis = {v['variavel']: v for v in monitor.relatorio()['variaveis']}
+    for variavel in ('Weight', 'MTRANS'):
+        assert niveis[variavel]['psi'] > 0.25
+        assert niveis[variavel]['nivel'] == 'significativo'
+    assert niveis['Weight']['ks'] > 0.3
+    assert niveis['Height']['nivel'] == 'estavel'
+
+
+def test_registro_a_registro_igual_ao_lote(dados, base):
+    # observar_registro (simulador e serviço) conta igual a observar (lotes)
+    amostra = dados.sample(LINHAS_MINIMAS, random_state=1)
+    lote, um_a_um = MonitorDrift.de_linha_de_base(base), MonitorDrift.de_linha_de_base(base)
+    lote.observar(amostra)
+    for registro in amostra.to_dict('records'):
+        um_a_um.observar_registro(registro)
+    assert lote.instantaneo() == um_a_um.instantaneo()
+    assert np.isclose(lote.relatorio()['psi_maximo'], um_a_um.relatorio()['psi_maximo'])
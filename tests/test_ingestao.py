@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+from obesidade.cubo import colunas_dashboard
+from obesidade.dados import carregar_base
+from obesidade.ingestao import BaseAoVivo, MonitorIngestao
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV = os.path.join(RAIZ, 'data', 'Obesity.csv')
+
+
+@pytest.fixture(scope='module')
+def linhas_csv():
+    with open(CSV, 'rb') as f:
+        return f.read().splitlines(keepends=True)
+
+
+@pytest.fixture
+def base():
+    return BaseAoVivo(carregar_base(CSV, colunas=colunas_dashboard))
+
+
+def _seguir(base, caminho):
+    base.monitor = MonitorIngestao(str(caminho))
+    return base.atualizar()
+
+
+def test_arquivo_que_cresce(base, linhas_csv, tmp_path):
+    caminho = tmp_path / 'triagem.csv'
+    caminho.write_bytes(b''.join(linhas_csv[:11]))
+    total = base.cubo.total()
+    # O conteúdo que já existia não é somado de novo
+    assert _seguir(base, caminho) == 0
+    with open(caminho, 'ab') as f:
+        f.write(b''.join(linhas_csv[11:16]))
+        # Linha ainda sendo escrita fica para a próxima verificação
+        f.write(linhas_csv[16].rstrip(b'\n'))
+    assert base.atualizar() == 5
+    with open(caminho, 'ab') as f:
+        f.write(b'\n')
+    assert base.atualizar() == 1
+    assert base.atualizar() == 0
+    assert base.cubo.total() == total + 6 and base.linhas_ingeridas == 6
+    assert base.monitor.rejeitados == []
+
+
+def test_arquivo_truncado_nao_conta_duas_vezes(base, linhas_csv, tmp_path):
+    caminho = tmp_path / 'triagem.csv'
+    caminho.write_bytes(linhas_csv[0])
+    _seguir(base, caminho)
+    with open(caminho, 'ab') as f:
+        f.write(b''.join(linhas_csv[1:21]))
+    assert base.atualizar() == 20
+    total = base.cubo.total()
+
+    # Truncado para um trecho do que já foi lido
+    caminho.write_bytes(b''.join(linhas_csv[:6]))
+    assert base.atualizar() == 0
+    assert base.cubo.total() == total
+    assert len(base.monitor.rejeitados) == 1
+    assert 'truncado' in base.monitor.rejeitados[0]['erro']
+
+    # O que é acrescentado depois volta a entrar
+    with open(caminho, 'ab') as f:
+        f.write(b''.join(linhas_csv[21:24]))
+    assert base.atualizar() == 3
+    assert base.cubo.total() == total + 3
+
+
+def test_arquivo_substituido_nao_conta_duas_vezes(base, linhas_csv, tmp_path):
+    caminho = tmp_path / 'triagem.csv'
+    caminho.write_bytes(linhas_csv[0])
+    _seguir(base, caminho)
+    with open(caminho, 'ab') as f:
+        f.write(b''.join(linhas_csv[1:11]))
+    assert base.atualizar() == 10
+    total = base.cubo.total()
+
+    # Trocado (outro inode) por um arquivo maior que repete as linhas lidas
+    novo = tmp_path / 'novo.csv'
+    novo.write_bytes(b''.join(linhas_csv[:31]))
+    os.replace(novo, caminho)
+    assert base.atualizar() == 0
+    assert base.cubo.total() == total
+    assert len(base.monitor.rejeitados) == 1
+
+    with open(caminho, 'ab') as f:
+        f.write(b''.join(linhas_csv[31:33]))
+    assert base.atualizar() == 2
+    assert base.cubo.total() == total + 2
+
+
+def test_arquivo_esvaziado_relê_o_cabecalho(base, linhas_csv, tmp_path):
+    caminho = tmp_path / 'triagem.csv'
+    caminho.write_bytes(b''.join(linhas_csv[:5]))
+    _seguir(base, caminho)
+    total = base.cubo.total()
+    caminho.write_bytes(b'')
+    assert base.atualizar() == 0
+    # Recomeça com um cabeçalho, como na rotação de um arquivo de log
+    caminho.write_bytes(b''.join([linhas_csv[0]] + linhas_csv[5:9]))
+    assert base.atualizar() == 4
+    assert base.cubo.total() == total + 4
+
+
+def test_pasta_de_entrada(base, linhas_csv, tmp_path):
+    (tmp_path / 'lote1.csv').write_bytes(b''.join(linhas_csv[:8]))
+    (tmp_path / 'lote2.csv').write_bytes(linhas_csv[0] + b'1,2,3\n')
+    total = base.cubo.total()
+    assert _seguir(base, tmp_path) == 7
+    assert [r['origem'] for r in base.monitor.rejeitados] == ['lote2.csv']
+    # Arquivos já vistos não são relidos
+    assert base.atualizar() == 0
+    assert base.cubo.total() == total + 7
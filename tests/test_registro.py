@@ -0,0 +1,128 @@
+import copy
+import os
+
+import joblib
+import pytest
+
+from obesidade import nucleo, registro
+from obesidade.registro import RegistroModelos
+from obesidade.treino import carregar_treino, construir_pipeline
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def pipelines():
+    X, y = carregar_treino(os.path.join(RAIZ, 'data', 'Obesity.csv'))
+    return [construir_pipeline({'n_estimators': n}).fit(X, y) for n in (3, 5)]
+
+
+@pytest.fixture
+def cargas(monkeypatch):
+    # Conta as desserializações feitas pelo registro
+    chamadas = []
+    original = registro.desserializar
+
+    def contar(caminho):
+        chamadas.append(caminho)
+        return original(caminho)
+
+    monkeypatch.setattr(registro, 'desserializar', contar)
+    return chamadas
+
+
+def _avancar_mtime(caminho):
+    info = os.stat(caminho)
+    os.utime(caminho, ns=(info.st_atime_ns, info.st_mtime_ns + 1_000_000_000))
+
+
+def test_recarrega_quando_o_arquivo_muda(pipelines, cargas, tmp_path):
+    caminho = str(tmp_path / 'modelo.pkl')
+    joblib.dump(pipelines[0], caminho)
+    reg = RegistroModelos()
+    v1 = reg.obter(caminho)
+    assert reg.obter(caminho) is v1
+    assert v1.modelo.named_steps['model'].n_estimators == 3
+
+    # Só o mtime muda: mesmo conteúdo, sem desserializar de novo
+    _avancar_mtime(caminho)
+    tocado = reg.obter(caminho)
+    assert tocado.modelo is v1.modelo and tocado.mtime != v1.mtime
+    assert len(cargas) == 1
+
+    joblib.dump(pipelines[1], caminho)
+    _avancar_mtime(caminho)
+    v2 = reg.obter(caminho)
+    assert v2.sha256 != v1.sha256
+    assert v2.modelo.named_steps['model'].n_estimators == 5
+    assert reg.obter(caminho) is v2
+    assert len(cargas) == 2
+    assert [h['sha256'] for h in reg.historico] == [v1.sha256, v2.sha256]
+
+
+def test_arquivo_corrompido_so_e_lido_de_novo_quando_muda(pipelines, cargas, tmp_path):
+    caminho = str(tmp_path / 'modelo.pkl')
+    with open(caminho, 'wb') as f:
+        f.write(b'nao e um pickle')
+    reg = RegistroModelos()
+    with pytest.raises(Exception) as primeiro:
+        reg.obter(caminho)
+    with pytest.raises(Exception) as segundo:
+        reg.obter(caminho)
+    # A mesma falha é devolvida sem reler o arquivo
+    assert segundo.value is primeiro.value is reg.ultimo_erro
+    assert len(cargas) == 1
+
+    joblib.dump(pipelines[0], caminho)
+    _avancar_mtime(caminho)
+    assert reg.obter(caminho).modelo.named_steps['model'].n_estimators == 3
+    assert len(cargas) == 2
+
+
+def test_falha_no_hot_reload_mantem_a_versao_anterior(pipelines, cargas, tmp_path):
+    caminho = str(tmp_path / 'modelo.pkl')
+    joblib.dump(pipelines[0], caminho)
+    reg = RegistroModelos()
+    v1 = reg.obter(caminho)
+
+    # Arquivo quebrado (ex.: cópia pela metade): continua servindo a v1
+    with open(caminho, 'r+b') as f:
+        f.truncate(100)
+    _avancar_mtime(caminho)
+    assert reg.obter(caminho) is v1
+    assert reg.obter(caminho) is v1
+    assert reg.ultimo_erro is not None
+    assert len(cargas) == 2
+
+    joblib.dump(pipelines[1], caminho)
+    _avancar_mtime(caminho)
+    assert reg.obter(caminho).modelo.named_steps['model'].n_estimators == 5
+    assert len(cargas) == 3
+
+
+def test_nao_depende_do_main(pipelines, tmp_path, monkeypatch):
+    # Como no modelo salvo pelo notebook, o pickle referencia
+    # __main__.arredondar_valores; o registro resolve pelo pacote
+    import __main__
+
+    def arredondar_valores(X_in):
+        return nucleo.arredondar_valores(X_in)
+    arredondar_valores.__module__ = '__main__'
+    arredondar_valores.__qualname__ = 'arredondar_valores'
+
+    pipeline = copy.deepcopy(pipelines[0])
+    preprocessor = pipeline.named_steps['preprocessor']
+    for nome, transformador, _ in preprocessor.transformers + preprocessor.transformers_:
+        if nome == 'num':
+            transformador.named_steps['arredondar'].func = arredondar_valores
+    caminho = str(tmp_path / 'modelo.pkl')
+    monkeypatch.setattr(__main__, 'arredondar_valores', arredondar_valores, raising=False)
+    joblib.dump(pipeline, caminho)
+    monkeypatch.delattr(__main__, 'arredondar_valores')
+
+    modelo = RegistroModelos().obter(caminho).modelo
+    assert not hasattr(__main__, 'arredondar_valores')
+    arredondar = modelo.named_steps['preprocessor'].named_transformers_['num'].named_steps['arredondar']
+    assert arredondar.func is nucleo.arredondar_valores
+    X = carregar_treino(os.path.join(RAIZ, 'data', 'Obesity.csv'))[0]
+    assert (modelo.predict(X) == pipelines[0].predict(X)).all()
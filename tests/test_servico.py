@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import os
+import threading
+
+import joblib
+import pytest
+
+from obesidade.registro import RegistroModelos
+from obesidade.servico import AgrupadorPredicoes, ClienteLocal, ServicoPredicao, validar_paciente
+from obesidade.treino import carregar_treino, construir_pipeline
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+paciente = {
+    'Age': 30, 'Gender': 'Masculino', 'Height': 1.70, 'Weight': 80.0,
+    'CALC': 'Às vezes', 'FAVC': 'Sim', 'FCVC': 2.0, 'NCP': 3.0, 'SCC': 'Não',
+    'SMOKE': 'Não', 'CH2O': 2.0, 'family_history': 'Sim', 'FAF': 1.0, 'TUE': 1.0,
+    'CAEC': 'Às vezes', 'MTRANS': 'Carro',
+}
+
+
+@pytest.fixture(scope='module')
+def caminho_modelo(tmp_path_factory):
+    # Floresta pequena treinada na base do repositório
+    X, y = carregar_treino(os.path.join(RAIZ, 'data', 'Obesity.csv'))
+    pipeline = construir_pipeline({'n_estimators': 5}).fit(X, y)
+    caminho = str(tmp_path_factory.mktemp('modelo') / 'modelo_obesidade.pkl')
+    joblib.dump(pipeline, caminho)
+    return caminho
+
+
+def _postar(caminho_modelo, pacientes):
+    async def rodar():
+        async with ClienteLocal(ServicoPredicao(caminho_modelo, max_lote=8, max_espera_ms=20)) as cliente:
+            return await asyncio.gather(*(cliente.post('/prever', p) for p in pacientes))
+    return asyncio.run(rodar())
+
+
+def test_lote_valido(caminho_modelo):
+    respostas = _postar(caminho_modelo, [paciente, {**paciente, 'Weight': 120.0}, {**paciente, 'MTRANS': 'Walking'}])
+    for status, resposta in respostas:
+        assert status == 200
+        assert resposta['classe'] in resposta['probabilidades']
+        assert sum(resposta['probabilidades'].values()) == pytest.approx(1.0)
+
+
+def test_lote_com_entradas_invalidas(caminho_modelo):
+    invalidos = [
+        {**paciente, 'Weight': 'nan'},
+        {**paciente, 'Age': 'inf'},
+        {**paciente, 'MTRANS': 'Jetpack'},
+        {k: v for k, v in paciente.items() if k != 'Height'},
+    ]
+    respostas = _postar(caminho_modelo, [paciente] + invalidos)
+    assert respostas[0][0] == 200
+    assert [status for status, _ in respostas[1:]] == [400] * len(invalidos)
+    assert all('erro' in resposta for _, resposta in respostas[1:])
+
+
+def test_parar_responde_quem_espera(caminho_modelo):
+    # Um lote preso na floresta e o resto na fila: parar() não deixa ninguém pendurado
+    pipeline = RegistroModelos().obter(caminho_modelo).modelo
+    liberar = threading.Event()
+
+    def obter_pipeline():
+        liberar.wait(5)
+        return pipeline
+
+    async def rodar():
+        agrupador = AgrupadorPredicoes(obter_pipeline, max_lote=2, max_espera_ms=1)
+        await agrupador.iniciar()
+        pedidos = [asyncio.ensure_future(agrupador.prever(validar_paciente(paciente))) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        await agrupador.parar()
+        resultados = await asyncio.wait_for(asyncio.gather(*pedidos, return_exceptions=True), 2)
+        liberar.set()
+        with pytest.raises(RuntimeError):
+            await agrupador.prever(validar_paciente(paciente))
+        return resultados
+
+    try:
+        resultados = asyncio.run(rodar())
+    finally:
+        liberar.set()
+    assert all(isinstance(r, RuntimeError) for r in resultados)
+
+
+def test_falha_no_drift_vai_para_o_log(caminho_modelo, caplog):
+    pipeline = RegistroModelos().obter(caminho_modelo).modelo
+
+    class MonitorQuebrado:
+        def observar_registro(self, registro, classe):
+            raise ValueError("monitor quebrado")
+
+    async def rodar():
+        agrupador = AgrupadorPredicoes(lambda: pipeline, obter_monitor=MonitorQuebrado)
+        await agrupador.iniciar()
+        resposta = await agrupador.prever(validar_paciente(paciente))
+        for _ in range(100):
+            if any(r.name == 'obesidade.servico' for r in caplog.records):
+                break
+            await asyncio.sleep(0.01)
+        await agrupador.parar()
+        return resposta
+
+    with caplog.at_level(logging.ERROR, logger='obesidade.servico'):
+        resposta = asyncio.run(rodar())
+    assert resposta['classe'] in resposta['probabilidades']
+    assert any(r.name == 'obesidade.servico' and 'monitor quebrado' in str(r.exc_info[1])
+               for r in caplog.records)
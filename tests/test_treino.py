@@ -0,0 +1,76 @@
+import json
+import os
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from obesidade import treino
+from obesidade.nucleo import cols_modelo
+from obesidade.treino import carregar_treino, construir_pipeline, salvar_artefato, treinar_em_blocos
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV = os.path.join(RAIZ, 'data', 'Obesity.csv')
+
+
+@pytest.fixture(scope='module')
+def em_blocos(tmp_path_factory):
+    pasta = tmp_path_factory.mktemp('blocos')
+    # Blocos e grupos bem menores que a base: vários grupos de árvores reunidos
+    pipeline, metadados = treinar_em_blocos(CSV, tamanho_bloco=300, amostra=400, parametros={'n_estimators': 12},
+                                            n_jobs=1, pasta_temporaria=str(pasta))
+    return pipeline, metadados, pasta
+
+
+def test_treino_em_blocos_reune_todas_as_arvores(em_blocos):
+    pipeline, metadados, pasta = em_blocos
+    floresta = pipeline.named_steps['model']
+    assert metadados['grupos'] > 1
+    assert len(floresta.estimators_) == floresta.n_estimators == 12
+    # Os arquivos temporários dos grupos são apagados
+    assert os.listdir(pasta) == []
+
+
+def test_treino_em_blocos_preve(em_blocos):
+    pipeline, metadados, _ = em_blocos
+    dados = pd.read_csv(CSV)
+    X = dados[cols_modelo]
+    floresta = pipeline.named_steps['model']
+    proba = pipeline.predict_proba(X)
+    assert proba.shape == (len(dados), dados['Obesity'].nunique())
+    assert np.allclose(proba.sum(axis=1), 1.0)
+    assert set(floresta.classes_) == set(dados['Obesity'])
+    assert set(pipeline.predict(X)) <= set(floresta.classes_)
+    # Todas as árvores conhecem todas as classes, na mesma ordem
+    assert all(arvore.n_classes_ == len(floresta.classes_) for arvore in floresta.estimators_)
+    assert metadados['metricas']['linhas_teste'] > 0
+    assert metadados['metricas']['acuracia_teste'] > 0.6
+
+
+def test_salvar_artefato_no_mesmo_segundo_nao_sobrescreve(tmp_path, monkeypatch):
+    class Relogio(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2026, 1, 2, 3, 4, 5, tzinfo=tz)
+
+    monkeypatch.setattr(treino, 'datetime', Relogio)
+    X, y = carregar_treino(CSV)
+    salvos = []
+    for n in (1, 2, 3):
+        pipeline = construir_pipeline({'n_estimators': n}).fit(X.head(200), y.head(200))
+        salvos.append(salvar_artefato(pipeline, {'n': n}, pasta=str(tmp_path), publicar=True))
+
+    assert [os.path.basename(m) for m, _ in salvos] == [
+        'modelo_obesidade-20260102T030405Z.pkl',
+        'modelo_obesidade-20260102T030405Z-2.pkl',
+        'modelo_obesidade-20260102T030405Z-3.pkl',
+    ]
+    for n, (caminho_modelo, caminho_meta) in enumerate(salvos, 1):
+        assert joblib.load(caminho_modelo).named_steps['model'].n_estimators == n
+        with open(caminho_meta, encoding='utf-8') as f:
+            meta = json.load(f)
+        assert meta['n'] == n and meta['modelo'] == os.path.basename(caminho_modelo)
+    # O publicado é o último
+    assert joblib.load(str(tmp_path / 'modelo_obesidade.pkl')).named_steps['model'].n_estimators == 3